@@ -0,0 +1,45 @@
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Raw user/model turns kept for the question being answered (re-asks after invalid answers), older ones are dropped
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", 3))
+
+def to_contents(history: List[Any]) -> List[Dict[str, Any]]:
+    """Gemini chat history as JSON-able {"role", "parts"} contents"""
+    return [{"role": content.role, "parts": [part.text for part in content.parts]} for content in history]
+
+def answered_summary(questions: List[str], answers: List[Optional[Dict]], next_question: Optional[str]) -> List[Dict[str, Any]]:
+    """One user/model exchange standing in for every completed question's turns"""
+    answered = [f"{i+1}. {question}: {answer['user']}" for i, (question, answer) in enumerate(zip(questions, answers)) if answer]
+    if not answered:
+        return []
+    summary = "Answered so far:\n" + "\n".join(answered)
+    if next_question:
+        summary += f"\n\nNext question: {next_question}"
+    return [
+        {"role": "user", "parts": [summary]},
+        {"role": "model", "parts": ["Noted."]}
+    ]
+
+def build_history(session: Dict[str, Any], questions: List[str]) -> List[Dict[str, Any]]:
+    """History sent to Gemini for the next turn: pinned instructions, answered so far summary, recent raw turns.
+    Its size no longer depends on how many questions were answered or re-asked."""
+    index = session["index"]
+    next_question = questions[index] if index < len(questions) else None
+    return session["pinned"] + answered_summary(questions, session["answers"], next_question) + session["turns"]
+
+def record_turn(session: Dict[str, Any], convo: Any, question_done: bool, max_turns: int = CHAT_HISTORY_MAX_TURNS):
+    """Keep the turn just sent, or drop the question's turns once its answer is in the summary"""
+    if question_done:
+        session["turns"] = []
+    else:
+        turns = session["turns"] + to_contents(convo.history[-2:])
+        session["turns"] = turns[-2 * max_turns:] if max_turns > 0 else []
+
+def prompt_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "prompt_token_count", None) if usage else None
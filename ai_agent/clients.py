@@ -0,0 +1,120 @@
+from typing import Any, Callable, Generic, TypeVar
+from dotenv import load_dotenv
+import os
+import threading
+
+# Load environment variables
+load_dotenv()
+
+T = TypeVar("T")
+
+class LazySingleton(Generic[T]):
+    """Process wide object created by factory on first get(), creation is guarded by a lock.
+    Keeps network calls and heavy SDK imports out of module import, so workers start fast and offline."""
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self.instance: Any = None
+        self.lock = threading.Lock()
+
+    def get(self) -> T:
+        instance = self.instance
+        if instance is not None:
+            return instance
+        with self.lock:
+            if self.instance is None:
+                print(f"Creating {self.name}")
+                self.instance = self.factory()
+            return self.instance
+
+    @property
+    def created(self) -> bool:
+        return self.instance is not None
+
+OPENAI_MODEL = "gpt-4o-mini"
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# --- GitHub ---
+def create_github_repo():
+    from github import Github
+    return Github(os.getenv("GITHUB_TOKEN")).get_repo(os.getenv("GITHUB_REPO"))
+
+def create_content_cache():
+    from github_content_cache import GithubContentCache
+    return GithubContentCache(github_repo.get(), os.getenv("GITHUB_TOKEN"), int(os.getenv("CONTENT_CACHE_MAX_BYTES", 32 * 1024 * 1024)))
+
+# --- LLM ---
+def create_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def create_async_openai_client():
+    # shared async client, its connection pool is reused by every async endpoint and graph node
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", 100)),
+                max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20))
+            )
+        )
+    )
+
+def create_gemini_model():
+    # configured once for the whole process (questionare chat, supervisor and submit service)
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+def create_llm_cache():
+    # identical prompts (re-verify, retried submits) are answered from this cache instead of the model
+    from llm_cache import LLMResponseCache
+    return LLMResponseCache(
+        os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3"),
+        ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 60 * 60)),
+        memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 256)),
+        disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", 10000))
+    )
+
+def create_classification_cache():
+    # document classification results by content hash, so re-uploaded documents skip the external API
+    from llm_cache import LLMResponseCache
+    return LLMResponseCache(
+        os.getenv("CLASSIFICATION_CACHE_PATH", ".classification_cache.sqlite3"),
+        ttl_seconds=int(os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60)),
+        memory_entries=int(os.getenv("CLASSIFICATION_CACHE_MEMORY_ENTRIES", 1024)),
+        disk_entries=int(os.getenv("CLASSIFICATION_CACHE_DISK_ENTRIES", 100000)),
+        table="classification_results"
+    )
+
+github_repo = LazySingleton("GitHub repo", create_github_repo)
+content_cache = LazySingleton("GitHub content cache", create_content_cache)
+openai_client = LazySingleton("OpenAI client", create_openai_client)
+async_openai_client = LazySingleton("async OpenAI client", create_async_openai_client)
+gemini_model = LazySingleton("Gemini model", create_gemini_model)
+llm_cache = LazySingleton("LLM response cache", create_llm_cache)
+classification_cache = LazySingleton("classification result cache", create_classification_cache)
+
+def get_repo():
+    return github_repo.get()
+
+def get_content_cache():
+    return content_cache.get()
+
+def get_openai_client():
+    return openai_client.get()
+
+def get_async_openai_client():
+    return async_openai_client.get()
+
+def get_gemini_model():
+    return gemini_model.get()
+
+def get_llm_cache():
+    return llm_cache.get()
+
+def get_classification_cache():
+    return classification_cache.get()
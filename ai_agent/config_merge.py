@@ -0,0 +1,247 @@
+from typing import Dict, List, Any, Tuple
+from io import StringIO
+from ruamel.yaml import YAML
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+from ruamel.yaml.scalarstring import ScalarString, DoubleQuotedScalarString
+from rcc_rules import RULE_TYPES, REGULATED, NON_REGULATED, partition_type, get_answer, parse_rcc_rules, rule_type_for, build_key, normalize_key
+
+# --- Round trip YAML Helpers ---
+def guess_indent(content: str) -> Tuple[int, int, int]:
+    """Guess (mapping, sequence, offset) indentation from the first nested mapping and sequence"""
+    mapping, sequence, offset = None, None, None
+    previous_indent, previous_opens_block = 0, False
+    for line in (content or "").splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if previous_opens_block and indent >= previous_indent:
+            if stripped.startswith("- ") and offset is None:
+                offset = indent - previous_indent
+                sequence = offset + 2
+            elif not stripped.startswith("-") and indent > previous_indent and mapping is None:
+                mapping = indent - previous_indent
+        previous_indent = indent
+        previous_opens_block = stripped.split(" #")[0].rstrip().endswith(":")
+    return mapping or 2, sequence or 2, offset or 0
+
+def load_round_trip(content: str) -> Tuple[YAML, Any]:
+    """Load YAML keeping comments, key order, quoting and the file's own indentation"""
+    mapping, sequence, offset = guess_indent(content)
+    yaml = YAML()
+    yaml.preserve_quotes = True
+    yaml.width = 4096
+    yaml.indent(mapping=mapping, sequence=sequence, offset=offset)
+    return yaml, yaml.load(content or "")
+
+def dump_round_trip(yaml: YAML, data: Any) -> str:
+    stream = StringIO()
+    yaml.dump(data, stream)
+    return stream.getvalue()
+
+def find_sections(data: Any, names: List[str]) -> Dict[str, Any]:
+    """Find the first mapping key matching each name (case in-sensitive) anywhere in the document.
+    Returns name -> (parent mapping, actual key)"""
+    wanted = {name.lower(): name for name in names}
+    found = {}
+
+    def walk(node: Any):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                name = wanted.get(str(key).lower())
+                if name and name not in found:
+                    found[name] = (node, key)
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(data)
+    return found
+
+# --- SOR Codes Merge ---
+def parse_sor_codes(sor_codes: str) -> Dict[str, List[str]]:
+    """Extract SOR codes from ACCT/SOR_CODE,DEAL/SOR_CODE input, grouped by Acct and DEAL"""
+    parsed = {"Acct": [], "DEAL": []}
+    for item in (sor_codes or "").split(","):
+        prefix, _, code = item.strip().partition("/")
+        code = code.strip()
+        if not code:
+            continue
+        if prefix.strip().upper() == "ACCT":
+            parsed["Acct"].append(code)
+        elif prefix.strip().upper() == "DEAL":
+            parsed["DEAL"].append(code)
+    return parsed
+
+def merge_sor_codes(sor_codes_content: str, sor_codes: str) -> Tuple[str, Dict[str, List[str]], Dict[str, List[str]]]:
+    """Add SOR codes missing (case in-sensitive) from the Acct / DEAL sections of the SOR codes YAML.
+    No new sections are created. Sections may be lists or comma separated strings, anything else
+    raises ValueError. Returns the updated YAML, the codes added per section and the codes skipped
+    because their section is not in the file."""
+    yaml, data = load_round_trip(sor_codes_content)
+    sections = find_sections(data, ["Acct", "DEAL"])
+    added = {}
+    skipped = {}
+
+    for section, codes in parse_sor_codes(sor_codes).items():
+        if not codes:
+            continue
+        if section not in sections:
+            skipped[section] = codes
+            continue
+        parent, key = sections[section]
+        if parent[key] is None:
+            parent[key] = []
+        current = parent[key]
+        if isinstance(current, str):
+            # Spring also binds a comma separated scalar to a List<String>, it is kept a scalar
+            current_codes = [code.strip() for code in current.split(",") if code.strip()]
+        elif isinstance(current, list):
+            current_codes = [str(code).strip() for code in current]
+        else:
+            raise ValueError(f"{key} must be a list or a comma separated string of SOR codes")
+        existing = {code.upper() for code in current_codes}
+        for code in codes:
+            if code.upper() not in existing:
+                if isinstance(current, list):
+                    current.append(code)
+                current_codes.append(code)
+                existing.add(code.upper())
+                added.setdefault(section, []).append(code)
+        if isinstance(current, str) and section in added:
+            separator = ", " if ", " in current else ","
+            value = separator.join(current_codes)
+            parent[key] = type(current)(value) if isinstance(current, ScalarString) else value
+
+    if not added:
+        return sor_codes_content, added, skipped
+    return dump_round_trip(yaml, data), added, skipped
+
+# --- RCC Rules Merge ---
+def quote_like(rules: Any, key: str) -> ScalarString:
+    """Quote a new [..] key the same way as the existing keys of the map (double quotes by default)"""
+    for existing_key in rules or {}:
+        if isinstance(existing_key, ScalarString):
+            return type(existing_key)(key)
+        break
+    return DoubleQuotedScalarString(key)
+
+def merge_rules(rules_content: str, questions: List[str], answers: Dict) -> Tuple[str, Dict[str, List[str]], List[Dict[str, Any]]]:
+    """Insert the RCC RULES input lines into their rule type map, keyed by [COUNTRY|...].
+    Keys that already exist are left untouched and no new sections are created.
+    Returns the updated YAML, the keys added per rule type and the lines that could not be added
+    (rule, lineNumber and reason)."""
+    yaml, data = load_round_trip(rules_content)
+    sections = find_sections(data, RULE_TYPES)
+    partition = partition_type(get_answer(questions, answers, "Partition"))
+    existing_keys = {}
+    added = {}
+    skipped = []
+
+    for row in parse_rcc_rules(get_answer(questions, answers, "RCC RULES")):
+        rule_type = rule_type_for(row, partition)
+        if not rule_type:
+            reason = f"its populated columns do not match a {partition} rule type" if partition else "the partition is missing or invalid"
+            skipped.append({"rule": row["rule"], "lineNumber": str(row["lineNumber"]), "reason": reason})
+            continue
+        if rule_type not in sections:
+            skipped.append({"rule": row["rule"], "lineNumber": str(row["lineNumber"]), "reason": f"the rules file has no {rule_type} section"})
+            continue
+        parent, section_key = sections[rule_type]
+        if parent[section_key] is None:
+            parent[section_key] = CommentedMap()
+        rules = parent[section_key]
+        if rule_type not in existing_keys:
+            existing_keys[rule_type] = {normalize_key(existing_key) for existing_key in rules}
+
+        key = build_key(row, rule_type)
+        if key in existing_keys[rule_type]:
+            continue
+        # if value is not present keep '' instead of null
+        rules[quote_like(rules, key)] = row.get("RCC") or ""
+        existing_keys[rule_type].add(key)
+        added.setdefault(rule_type, []).append(key)
+
+    if not added:
+        return rules_content, added, skipped
+    return dump_round_trip(yaml, data), added, skipped
+
+# --- BU On Boarding Merge ---
+BU_ON_BOARDING_SECTION = "busUnitOnBoardingCongif"
+AUTO_APPROVE = "AUTO_APPROVE"
+DEFAULT_NOTIFICATION_RECIPTS = "abc@test.com"
+
+def parse_sampling_values(sampling_data: str) -> List[str]:
+    """Sampling Data is a comma or new line separated list"""
+    return [value.strip() for value in (sampling_data or "").replace("\n", ",").split(",") if value.strip()]
+
+def merge_bu_on_boarding(bu_on_boarding_content: str, questions: List[str], answers: Dict) -> Tuple[str, str]:
+    """Create or update the Bus Unit entry of busUnitOnBoardingCongif:
+    - contentRepoRef gets "<Partition>_OS1" appended if missing
+    - dispositionConfig notification flags, when not set yet, are true only for Regulated partitions
+    - SamplingConfig values are appended to the entry with the same ruleRef, or a new entry is created
+    Returns the updated YAML and "created" / "updated"."""
+    bus_unit = get_answer(questions, answers, "BUS UNIT").strip()
+    if not bus_unit:
+        raise ValueError("BUS UNIT is missing from INPUT DATA")
+    partition = get_answer(questions, answers, "Partition").strip().upper()
+    regulated = partition_type(partition) == REGULATED
+    sampling_rule_ref = get_answer(questions, answers, "Sampling Rule Ref").strip()
+    rule_ref = AUTO_APPROVE if partition_type(partition) == NON_REGULATED else (sampling_rule_ref or AUTO_APPROVE)
+    sampling_id = get_answer(questions, answers, "Sampling Id").strip()
+    sampling_values = parse_sampling_values(get_answer(questions, answers, "Sampling Data"))
+
+    yaml, data = load_round_trip(bu_on_boarding_content)
+    if data is None:
+        data = CommentedMap()
+    sections = find_sections(data, [BU_ON_BOARDING_SECTION])
+    if BU_ON_BOARDING_SECTION in sections:
+        parent, section_key = sections[BU_ON_BOARDING_SECTION]
+    else:
+        parent, section_key = data, BU_ON_BOARDING_SECTION
+        parent[section_key] = CommentedMap()
+    if parent[section_key] is None:
+        parent[section_key] = CommentedMap()
+    bus_units = parent[section_key]
+
+    action = "updated" if bus_unit in bus_units else "created"
+    if bus_units.get(bus_unit) is None:
+        bus_units[bus_unit] = CommentedMap()
+    entry = bus_units[bus_unit]
+
+    content_repo_ref = f"{partition}_OS1"
+    if entry.get("contentRepoRef") is None:
+        entry["contentRepoRef"] = CommentedSeq()
+    if content_repo_ref not in entry["contentRepoRef"]:
+        entry["contentRepoRef"].append(content_repo_ref)
+
+    if entry.get("dispositionConfig") is None:
+        entry["dispositionConfig"] = CommentedMap()
+    disposition_config = entry["dispositionConfig"]
+    # flags already set on an existing BU are kept, a later submit must not downgrade a regulated BU
+    for flag in ["enableDeleteNotification", "enableCaseNOtification"]:
+        if disposition_config.get(flag) is None:
+            disposition_config[flag] = regulated
+    if not disposition_config.get("notificationRecipts"):
+        disposition_config["notificationRecipts"] = DEFAULT_NOTIFICATION_RECIPTS
+
+    if entry.get("SamplingConfig") is None:
+        entry["SamplingConfig"] = CommentedSeq()
+    sampling_config = next((c for c in entry["SamplingConfig"] if isinstance(c, dict) and c.get("ruleRef") == rule_ref), None)
+    if sampling_config is None:
+        sampling_config = CommentedMap()
+        sampling_config["ruleRef"] = rule_ref
+        entry["SamplingConfig"].append(sampling_config)
+    if sampling_config.get("sampling") is None:
+        sampling_config["sampling"] = CommentedMap()
+    sampling = sampling_config["sampling"]
+    if sampling_id and not sampling.get("id"):
+        sampling["id"] = sampling_id
+    if sampling.get("values") is None:
+        sampling["values"] = CommentedSeq()
+    for value in sampling_values:
+        if value not in sampling["values"]:
+            sampling["values"].append(value)
+
+    return dump_round_trip(yaml, data), action
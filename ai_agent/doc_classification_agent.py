@@ -1,17 +1,23 @@
-from typing import Dict, List, Any
+from typing import TYPE_CHECKING, Dict, List, Any, BinaryIO, Optional
 from dotenv import load_dotenv
 import os
-import aiohttp
-import asyncio
+import json
 import base64
-import threading
-import concurrent.futures
+from http_session import http_session
+from fan_out import fan_out, post_with_retry
+from upload_stream import read_chunks
+from llm_cache import classification_cache_key
+from clients import get_classification_cache
+
+if TYPE_CHECKING:
+    import aiohttp
 
 # Load environment variables
 load_dotenv()
 
-async def call_external_api(file_content: bytes, filename: str) -> Dict:
-    """Call external API with basic auth for a single file"""
+async def call_external_api(session: "aiohttp.ClientSession", file: BinaryIO, filename: str, sha256: Optional[str] = None, country: str = "", acct_sor: str = "") -> Dict:
+    """Call external API with basic auth for a single file, files already classified (same sha256, country
+    and acct_sor) are answered from the classification cache"""
     try:
         # Get API configuration from environment
         base_url = os.getenv("TARGET_API_BASE_URL", "https://api.example.com")
@@ -24,53 +30,71 @@ async def call_external_api(file_content: bytes, filename: str) -> Dict:
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
         auth_header = f"Basic {encoded_credentials}"
         
-        async with aiohttp.ClientSession() as session:
-            # Prepare the request data
+        # Prepare the request data (rebuilt for every attempt), the file is streamed from its start in chunks
+        def build_data():
+            import aiohttp
             data = aiohttp.FormData()
-            data.add_field('file', file_content, filename=filename)
-            
-            # Make the API call with basic auth
-            headers = {
-                'Authorization': auth_header,
-                'Content-Type': 'multipart/form-data'
+            data.add_field('file', read_chunks(file), filename=filename)
+            return data
+        
+        # Make the API call with basic auth (aiohttp sets the multipart Content-Type with its boundary)
+        headers = {
+            'Authorization': auth_header
+        }
+        
+        url = f"{base_url}{endpoint}"
+        
+        cache_key = classification_cache_key(sha256, country, acct_sor, url) if sha256 else None
+        if cache_key and (cached := await get_classification_cache().aget(cache_key)) is not None:
+            return {
+                "filename": filename,
+                "status": "success",
+                "api_response": json.loads(cached),
+                "attempts": 0,
+                "cached": True
+            }
+        
+        status, result, attempts = await post_with_retry(session, url, build_data, headers)
+        if status == 200:
+            if cache_key:
+                await get_classification_cache().aput(cache_key, json.dumps(result))
+            return {
+                "filename": filename,
+                "status": "success",
+                "api_response": result,
+                "attempts": attempts,
+                "cached": False
+            }
+        else:
+            return {
+                "filename": filename,
+                "status": "error",
+                "error": f"API returned status {status}: {result}",
+                "attempts": attempts,
+                "cached": False
             }
-            
-            url = f"{base_url}{endpoint}"
-            
-            async with session.post(url, data=data, headers=headers) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return {
-                        "filename": filename,
-                        "status": "success",
-                        "api_response": result
-                    }
-                else:
-                    error_text = await response.text()
-                    return {
-                        "filename": filename,
-                        "status": "error",
-                        "error": f"API returned status {response.status}: {error_text}"
-                    }
                     
     except Exception as e:
         return {
             "filename": filename,
             "status": "error",
-            "error": f"Exception occurred: {str(e)}"
+            "error": f"Exception occurred: {str(e)}",
+            "attempts": getattr(e, "attempts", 1),
+            "cached": False
         }
 
 async def doc_classification_agent(uploaded_files: List[Dict]) -> Dict[str, Any]:
     """Document Classification Agent: Calls external API service to classify and process uploaded documents"""
     
-    # Call external API for each file
-    tasks = []
-    for file_info in uploaded_files:
-        task = call_external_api(file_info["content"], file_info["filename"])
-        tasks.append(task)
-    
-    # Wait for all API calls to complete
-    api_results = await asyncio.gather(*tasks, return_exceptions=True)
+    # Call external API for each file (bounded concurrency), all calls share one pooled session
+    async with http_session.scope() as session:
+        api_results = await fan_out(
+            uploaded_files,
+            lambda file_info: call_external_api(
+                session, file_info["file"], file_info["filename"],
+                file_info.get("sha256"), file_info.get("country", ""), file_info.get("acct_sor", "")
+            )
+        )
     
     # Process results
     processed_results = []
@@ -93,7 +117,9 @@ async def doc_classification_agent(uploaded_files: List[Dict]) -> Dict[str, Any]
         "summary": {
             "total_files": len(uploaded_files),
             "successful": len(successful_files),
-            "failed": len(failed_files)
+            "failed": len(failed_files),
+            "retried": len([r for r in processed_results if r.get("attempts", 1) > 1]),
+            "cached": len([r for r in processed_results if r.get("cached")])
         },
         "results": processed_results,
         "successful_files": successful_files,
@@ -101,20 +127,3 @@ async def doc_classification_agent(uploaded_files: List[Dict]) -> Dict[str, Any]
     }
     
     return doc_classification_result
-
-def doc_classification_agent_sync(uploaded_files: List[Dict]) -> Dict[str, Any]:
-    """Synchronous wrapper for doc_classification_agent using threading"""
-    
-    def run_async_in_thread():
-        """Run the async function in a separate thread with its own event loop"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(doc_classification_agent(uploaded_files))
-        finally:
-            loop.close()
-    
-    # Use ThreadPoolExecutor to run the async function in a separate thread
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(run_async_in_thread)
-        return future.result() 
\ No newline at end of file
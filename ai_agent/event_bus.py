@@ -0,0 +1,96 @@
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Set, Any, AsyncIterator, Tuple
+import asyncio
+import time
+
+class Subscription:
+    """One SSE client: a bounded queue that drops its oldest event when the client falls behind"""
+
+    def __init__(self, channel: Optional[str], maxsize: int):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event: Tuple[int, Any]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+class EventBroadcaster:
+    """Pub/sub for UI events keyed by workflow id.
+
+    Subscribers of a channel only get that workflow's events, subscribers of the None channel get
+    every event. Each event gets a monotonic id and the last replay_size events of every channel
+    are kept in a ring buffer, so a client reconnecting with Last-Event-ID only receives what it
+    missed. At most max_channels channel buffers are kept (least recently published dropped first).
+    Must be used from the event loop thread."""
+
+    def __init__(self, maxsize: int = 100, replay_size: int = 200, max_channels: int = 1000):
+        self.maxsize = maxsize
+        self.replay_size = replay_size
+        self.max_channels = max_channels
+        self.channels: Dict[Optional[str], Set[Subscription]] = {}
+        # channel -> ring buffer of (id, event), None holds the events of every channel
+        self.replay: "OrderedDict[Optional[str], deque]" = OrderedDict()
+        # ids start from the wall clock so they keep increasing across restarts
+        self.last_id = int(time.time() * 1000)
+
+    def subscribe(self, channel: Optional[str] = None) -> Subscription:
+        subscription = Subscription(channel, self.maxsize)
+        self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.channels.get(subscription.channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.channels[subscription.channel]
+
+    def publish(self, channel: Optional[str], event: Any):
+        self.last_id += 1
+        entry = (self.last_id, event)
+        self._remember(channel, entry)
+        for subscription in self.channels.get(channel, ()):
+            subscription.offer(entry)
+        if channel is not None:
+            self._remember(None, entry)
+            for subscription in self.channels.get(None, ()):
+                subscription.offer(entry)
+
+    def _remember(self, channel: Optional[str], entry: Tuple[int, Any]):
+        if channel not in self.replay:
+            self.replay[channel] = deque(maxlen=self.replay_size)
+        self.replay.move_to_end(channel)
+        self.replay[channel].append(entry)
+        while len(self.replay) > self.max_channels:
+            self.replay.popitem(last=False)
+
+    def missed_events(self, channel: Optional[str], last_event_id: int) -> list:
+        return [entry for entry in self.replay.get(channel, ()) if entry[0] > last_event_id]
+
+    async def stream(self, channel: Optional[str] = None, last_event_id: Optional[int] = None) -> AsyncIterator[Tuple[int, Any]]:
+        """Yield (id, event) pairs, starting with the buffered events after last_event_id"""
+        # subscribing and reading the ring buffer happen without yielding to the loop, so no event is lost in between
+        subscription = self.subscribe(channel)
+        missed = self.missed_events(channel, last_event_id) if last_event_id is not None else []
+        try:
+            sent_id = last_event_id or 0
+            for entry in missed:
+                sent_id = entry[0]
+                yield entry
+            while True:
+                entry = await subscription.queue.get()
+                if entry[0] > sent_id:
+                    yield entry
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self.channels),
+            "subscribers": sum(len(subscribers) for subscribers in self.channels.values()),
+            "replay_channels": len(self.replay),
+            "last_id": self.last_id
+        }
@@ -0,0 +1,65 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import asyncio
+import os
+import random
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Load environment variables
+load_dotenv()
+
+# Throttling and transient server errors are retried, other statuses are returned as they are
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+FAN_OUT_CONCURRENCY = int(os.getenv("FAN_OUT_CONCURRENCY", 10))
+HTTP_REQUEST_TIMEOUT_SECONDS = float(os.getenv("HTTP_REQUEST_TIMEOUT_SECONDS", 60))
+HTTP_MAX_ATTEMPTS = int(os.getenv("HTTP_MAX_ATTEMPTS", 4))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv("HTTP_BACKOFF_BASE_SECONDS", 0.5))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv("HTTP_BACKOFF_MAX_SECONDS", 10))
+
+class RequestFailed(Exception):
+    def __init__(self, message: str, attempts: int):
+        super().__init__(message)
+        self.attempts = attempts
+
+async def fan_out(items: List[Any], worker: Callable[[Any], Awaitable[Any]], concurrency: int = FAN_OUT_CONCURRENCY) -> List[Any]:
+    """Run worker over items with at most concurrency calls in flight.
+    Like asyncio.gather(return_exceptions=True), results (or exceptions) keep the order of items."""
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(item: Any) -> Any:
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full jitter exponential backoff, a numeric Retry-After from the server takes precedence"""
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_MAX_SECONDS)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+
+async def post_with_retry(session: "aiohttp.ClientSession", url: str, build_data: Callable[[], Any], headers: Dict[str, str],
+                          max_attempts: int = HTTP_MAX_ATTEMPTS, timeout_seconds: float = HTTP_REQUEST_TIMEOUT_SECONDS) -> Tuple[int, Any, int]:
+    """POST with a per attempt timeout, retrying timeouts, connection errors and RETRY_STATUSES.
+    build_data is called for every attempt since aiohttp FormData can only be sent once.
+    Returns (status, json body on 200 else text, attempts). Raises RequestFailed once attempts run out."""
+    import aiohttp
+    timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+    for attempt in range(1, max_attempts + 1):
+        try:
+            async with session.post(url, data=build_data(), headers=headers, timeout=timeout) as response:
+                if response.status == 200:
+                    return response.status, await response.json(), attempt
+                body = await response.text()
+                if response.status not in RETRY_STATUSES or attempt == max_attempts:
+                    return response.status, body, attempt
+                delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+            if attempt == max_attempts:
+                raise RequestFailed(f"{e!r} after {attempt} attempts", attempt) from e
+            delay = backoff_delay(attempt)
+            print(f"POST {url} failed on attempt {attempt}: {e!r}, retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
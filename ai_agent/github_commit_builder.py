@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional
+from github import GithubException, InputGitTreeElement
+
+# GitHub lists at most this many changed files in a comparison
+COMPARE_MAX_FILES = 300
+
+class StaleFilesError(Exception):
+    """Staged files were changed on the branch after the content they were built from was read"""
+    pass
+
+class CommitBuilder:
+    """Collects file updates and writes them to a branch as a single commit using the Git Data API
+    (blobs -> tree -> commit -> ref update)"""
+
+    def __init__(self, repo, branch_name: str, max_retries: int = 3):
+        self.repo = repo
+        self.branch_name = branch_name
+        self.max_retries = max_retries
+        self.files: Dict[str, str] = {}
+
+    def add_file(self, file_path: str, content: str):
+        """Stage the full new content of a file for the commit"""
+        self.files[file_path] = content
+
+    def _create_blobs(self) -> list:
+        # Blobs are content addressed, so they stay valid across rebase retries
+        elements = []
+        for file_path, content in self.files.items():
+            blob = self.repo.create_git_blob(content, "utf-8")
+            elements.append(InputGitTreeElement(file_path, "100644", "blob", sha=blob.sha))
+        return elements
+
+    def _changed_files(self, base_sha: str, head_sha: str) -> List[str]:
+        """Staged paths changed by the commits between base_sha and head_sha"""
+        if base_sha == head_sha:
+            return []
+        comparison = self.repo.compare(base_sha, head_sha)
+        if len(comparison.files) >= COMPARE_MAX_FILES:
+            # the list may be truncated, so any staged file may have changed
+            return list(self.files)
+        changed = set()
+        for file in comparison.files:
+            changed.add(file.filename)
+            if getattr(file, "previous_filename", None):
+                changed.add(file.previous_filename)
+        return [file_path for file_path in self.files if file_path in changed]
+
+    def commit(self, message: str, base_sha: Optional[str] = None) -> str:
+        """Create one commit with every staged file on top of the branch head and move the ref to it.
+
+        base_sha is the commit the staged content was built from (the branch head at commit time when
+        not given). If the branch has moved past it, the commit is rebuilt on the new head only when the
+        new commits left the staged files alone, otherwise StaleFilesError is raised instead of
+        reverting their changes. Returns the new commit sha, or an empty string when nothing was staged."""
+        if not self.files:
+            return ""
+
+        elements = self._create_blobs()
+        ref = self.repo.get_git_ref(f"heads/{self.branch_name}")
+        base_sha = base_sha or ref.object.sha
+
+        for attempt in range(1, self.max_retries + 1):
+            changed = self._changed_files(base_sha, ref.object.sha)
+            if changed:
+                raise StaleFilesError(f"{', '.join(changed)} changed on {self.branch_name} since they were read, submit again")
+            parent = self.repo.get_git_commit(ref.object.sha)
+            tree = self.repo.create_git_tree(elements, parent.tree)
+            new_commit = self.repo.create_git_commit(message, tree, [parent])
+            try:
+                # force=False makes GitHub reject the update unless it is a fast-forward
+                ref.edit(new_commit.sha, force=False)
+                return new_commit.sha
+            except GithubException as e:
+                if e.status != 422 or attempt == self.max_retries:
+                    raise
+                print(f"Branch {self.branch_name} moved while committing, rebasing (attempt {attempt})")
+                ref = self.repo.get_git_ref(f"heads/{self.branch_name}")
+        return ""
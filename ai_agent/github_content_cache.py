@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import re
+import threading
+import requests
+from urllib.parse import quote
+
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+class GithubContentCache:
+    """File content cache keyed by (commit sha, path).
+
+    Content at a commit sha never changes, so entries only leave the cache through LRU eviction
+    once max_bytes is exceeded. Branch names are resolved to a sha with a conditional request
+    (If-None-Match on the last ETag), so an unchanged branch costs a single 304 that GitHub does
+    not count against the rate limit."""
+
+    def __init__(self, repo, token: Optional[str], max_bytes: int = 32 * 1024 * 1024):
+        self.repo = repo
+        self.token = token
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        # branch name -> (etag, sha)
+        self.refs: Dict[str, Tuple[str, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def resolve_sha(self, ref: str) -> str:
+        """Resolve a branch (or sha) to a commit sha, revalidating the previous answer with its ETag"""
+        if SHA_PATTERN.match(ref):
+            return ref
+
+        headers = {"Accept": "application/vnd.github.sha"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        with self.lock:
+            cached = self.refs.get(ref)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        # branch names may contain #, ? or %, which would otherwise end or change the path
+        response = requests.get(f"{self.repo.url}/commits/{quote(ref, safe='/')}", headers=headers, timeout=30)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+
+        sha = response.text.strip()
+        etag = response.headers.get("ETag")
+        if etag:
+            with self.lock:
+                self.refs[ref] = (etag, sha)
+        return sha
+
+    def fetch(self, ref: str, file_path: str) -> str:
+        """Return the decoded content of file_path at ref, downloading it only on a cache miss"""
+        sha = self.resolve_sha(ref)
+        key = (sha, file_path)
+        with self.lock:
+            content = self.entries.get(key)
+            if content is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return content
+            self.misses += 1
+
+        content = self.repo.get_contents(file_path, ref=sha).decoded_content.decode()
+        self.put(key, content)
+        return content
+
+    def put(self, key: Tuple[str, str], content: str):
+        size = len(content.encode())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size_bytes -= len(self.entries.pop(key).encode())
+            self.entries[key] = content
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size_bytes -= len(evicted.encode())
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "size_bytes": self.size_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
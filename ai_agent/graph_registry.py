@@ -0,0 +1,122 @@
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+import threading
+import time
+
+class GraphRegistry:
+    """Compiled LangGraph graphs by name.
+
+    Each graph is registered with a builder returning its StateGraph and is compiled once, either
+    at startup through compile_all or on first use. Graphs registered with checkpoint=True share a
+    single checkpointer, so their threads must be released with delete_thread when a workflow ends.
+    Compile and invoke times are recorded per graph. LangGraph itself is only imported by the builders
+    and the default checkpointer, so importing the app does not pay for it."""
+
+    def __init__(self, checkpointer: Optional[Any] = None):
+        # a MemorySaver is created when the first checkpointed graph is compiled, unless one is given
+        self.checkpointer = checkpointer
+        # name -> (builder, checkpoint)
+        self.builders: Dict[str, tuple] = {}
+        self.compiled: Dict[str, Any] = {}
+        self.metrics: Dict[str, Dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable[[], Any], checkpoint: bool = False):
+        """builder returns the (uncompiled) StateGraph"""
+        with self.lock:
+            self.builders[name] = (builder, checkpoint)
+            self.compiled.pop(name, None)
+            self.metrics[name] = {
+                "compile_seconds": 0.0,
+                "invocations": 0,
+                "errors": 0,
+                "invoke_seconds_total": 0.0,
+                "invoke_seconds_max": 0.0
+            }
+
+    def get(self, name: str):
+        """Return the compiled graph, compiling it on first use"""
+        compiled = self.compiled.get(name)
+        if compiled is not None:
+            return compiled
+        with self.lock:
+            if name not in self.compiled:
+                if name not in self.builders:
+                    raise KeyError(f"Graph {name} is not registered")
+                builder, checkpoint = self.builders[name]
+                if checkpoint and self.checkpointer is None:
+                    from langgraph.checkpoint.memory import MemorySaver
+                    self.checkpointer = MemorySaver()
+                start = time.perf_counter()
+                self.compiled[name] = builder().compile(checkpointer=self.checkpointer if checkpoint else None)
+                self.metrics[name]["compile_seconds"] = time.perf_counter() - start
+                print(f"Compiled graph {name} in {self.metrics[name]['compile_seconds'] * 1000:.1f} ms")
+            return self.compiled[name]
+
+    def compile_all(self):
+        for name in list(self.builders):
+            self.get(name)
+
+    def invoke(self, name: str, state: Any, config: Optional[Dict] = None):
+        compiled = self.get(name)
+        start = time.perf_counter()
+        try:
+            return compiled.invoke(state, config=config)
+        except Exception:
+            self._record_error(name)
+            raise
+        finally:
+            self._record_invoke(name, time.perf_counter() - start)
+
+    async def ainvoke(self, name: str, state: Any, config: Optional[Dict] = None):
+        compiled = self.get(name)
+        start = time.perf_counter()
+        try:
+            return await compiled.ainvoke(state, config=config)
+        except Exception:
+            self._record_error(name)
+            raise
+        finally:
+            self._record_invoke(name, time.perf_counter() - start)
+
+    async def astream(self, name: str, state: Any, config: Optional[Dict] = None, **kwargs) -> AsyncIterator[Any]:
+        """ainvoke that also yields the graph's stream chunks (e.g. stream_mode="updates" for node progress)"""
+        compiled = self.get(name)
+        start = time.perf_counter()
+        try:
+            async for chunk in compiled.astream(state, config=config, **kwargs):
+                yield chunk
+        except Exception:
+            self._record_error(name)
+            raise
+        finally:
+            self._record_invoke(name, time.perf_counter() - start)
+
+    def delete_thread(self, thread_id: str):
+        """Drop the checkpoints of a finished workflow from the shared checkpointer"""
+        if self.checkpointer is not None:
+            self.checkpointer.delete_thread(thread_id)
+
+    def _record_invoke(self, name: str, seconds: float):
+        with self.lock:
+            metrics = self.metrics[name]
+            metrics["invocations"] += 1
+            metrics["invoke_seconds_total"] += seconds
+            metrics["invoke_seconds_max"] = max(metrics["invoke_seconds_max"], seconds)
+
+    def _record_error(self, name: str):
+        with self.lock:
+            self.metrics[name]["errors"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            stats = {}
+            for name, metrics in self.metrics.items():
+                invocations = metrics["invocations"]
+                stats[name] = {
+                    **metrics,
+                    "compiled": name in self.compiled,
+                    "invoke_seconds_avg": metrics["invoke_seconds_total"] / invocations if invocations else 0.0
+                }
+            return stats
+
+graph_registry = GraphRegistry()
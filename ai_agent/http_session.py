@@ -0,0 +1,60 @@
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+from dotenv import load_dotenv
+import asyncio
+import os
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Load environment variables
+load_dotenv()
+
+class SharedHttpSession:
+    """Application scoped aiohttp.ClientSession for the document classification API.
+
+    Started on FastAPI startup and closed on shutdown, so every file of every upload reuses pooled
+    keep-alive connections (and cached DNS) instead of a new TCP / TLS handshake per document.
+    The session belongs to the loop it was started on; callers running on another loop (or before
+    startup) get a temporary session instead. aiohttp is imported on first use to keep it out of the app's import time."""
+
+    def __init__(self):
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def create_connector(self) -> "aiohttp.TCPConnector":
+        import aiohttp
+        return aiohttp.TCPConnector(
+            limit=int(os.getenv("HTTP_MAX_CONNECTIONS", 100)),
+            limit_per_host=int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20)),
+            keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_SECONDS", 30)),
+            use_dns_cache=True,
+            ttl_dns_cache=int(os.getenv("HTTP_DNS_CACHE_SECONDS", 300))
+        )
+
+    async def start(self):
+        import aiohttp
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(connector=self.create_connector())
+            self.loop = asyncio.get_running_loop()
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.loop = None
+
+    def is_running(self) -> bool:
+        return self.session is not None and not self.session.closed and self.loop is not None and not self.loop.is_closed()
+
+    @asynccontextmanager
+    async def scope(self) -> AsyncIterator["aiohttp.ClientSession"]:
+        """Yield the shared session, or a temporary one when not on the session's loop"""
+        if self.is_running() and asyncio.get_running_loop() is self.loop:
+            yield self.session
+        else:
+            import aiohttp
+            async with aiohttp.ClientSession(connector=self.create_connector()) as session:
+                yield session
+
+http_session = SharedHttpSession()
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = {COMPLETED, FAILED, CANCELLED}
+
+class JobQueueFull(Exception):
+    pass
+
+class Job:
+    """One background pipeline run and its node level progress"""
+
+    def __init__(self, workflow_id: Optional[str], total_nodes: int):
+        self.id = str(uuid.uuid4())
+        self.workflow_id = workflow_id
+        self.status = QUEUED
+        self.total_nodes = total_nodes
+        self.completed_nodes: List[str] = []
+        self.current_node: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def node_completed(self, node: str):
+        self.completed_nodes.append(node)
+        self.current_node = node
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "workflow_id": self.workflow_id,
+            "status": self.status,
+            "progress": round(len(self.completed_nodes) / self.total_nodes, 2) if self.total_nodes else None,
+            "current_node": self.current_node,
+            "completed_nodes": self.completed_nodes,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "final_state": self.result
+        }
+
+class JobManager:
+    """Runs pipeline jobs in the background on the event loop.
+
+    At most max_running jobs run at a time and at most max_queued wait for a slot (JobQueueFull
+    beyond that). The last history_size finished jobs are kept for status lookups. Cancelling stops
+    the job at its next await, a sync graph node already running in a worker thread finishes first.
+    Must be used from the event loop thread."""
+
+    def __init__(self, max_running: int = 2, max_queued: int = 50, history_size: int = 200):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.history_size = history_size
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.slots = asyncio.Semaphore(max(max_running, 1))
+
+    def submit(self, run: Callable[[Job], Awaitable[Any]], workflow_id: Optional[str] = None, total_nodes: int = 0) -> Job:
+        """Queue run(job) and return the job right away"""
+        unfinished = sum(1 for job in self.jobs.values() if job.status not in FINISHED)
+        if unfinished >= self.max_running + self.max_queued:
+            raise JobQueueFull(f"{self.max_queued} jobs are already waiting, try again later")
+        job = Job(workflow_id, total_nodes)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, run))
+        job.task.add_done_callback(lambda task: self._finished(job, task))
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[Any]]):
+        try:
+            async with self.slots:
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.result = await run(job)
+                job.status = COMPLETED
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.status = FAILED
+            job.error = str(e)
+
+    def _finished(self, job: Job, task: asyncio.Task):
+        # a job cancelled before its task started never enters _run, so the status is settled here
+        if task.cancelled():
+            job.status = CANCELLED
+        job.finished_at = time.time()
+        job.task = None
+        self._evict()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is not None and job.task is not None and job.status not in FINISHED:
+            job.status = CANCELLING
+            job.task.cancel()
+        return job
+
+    def count(self, status: str) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == status)
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - self.history_size, 0)]:
+            del self.jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_running": self.max_running,
+            "max_queued": self.max_queued,
+            **{status: self.count(status) for status in (QUEUED, RUNNING, CANCELLING, COMPLETED, FAILED, CANCELLED)}
+        }
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+def cache_key(provider: str, model: str, system_prompt: str, user_prompt: str, format: str) -> str:
+    """Content hash of everything that determines an LLM response"""
+    payload = json.dumps([provider, model, system_prompt, user_prompt, format], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def classification_cache_key(sha256: str, country: str, acct_sor: str, url: str) -> str:
+    """Documents are classified by content, so re-uploads of the same file share a key"""
+    payload = json.dumps([sha256, country or "", acct_sor or "", url], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class LLMResponseCache:
+    """Two tier LLM response cache: an in-memory LRU in front of a local SQLite table.
+    Entries expire after ttl_seconds, and each tier is capped by its own entry count.
+    Also used for other string responses (document classification) through its own table."""
+
+    def __init__(self, path: str, ttl_seconds: int = 24 * 60 * 60, memory_entries: int = 256, disk_entries: int = 10000, table: str = "llm_responses"):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        # key -> (expires_at, response)
+        self.memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+        self.db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry[0] > now:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.memory[key]
+
+            row = self.db.execute(
+                f"SELECT response, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.db.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self._remember(key, row[1], row[0])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        # an empty answer is usually a transient failure, caching it would replay it until it expires
+        if not (response or "").strip():
+            return
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self.lock:
+            self._remember(key, expires_at, response)
+            self.db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, response, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, expires_at, now)
+            )
+            self.db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            self.db.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.disk_entries,)
+            )
+            self.db.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get from async code, the SQLite read (and its last_used commit) runs in a worker thread"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, response: str):
+        """put from async code, the SQLite write runs in a worker thread"""
+        await asyncio.to_thread(self.put, key, response)
+
+    def _remember(self, key: str, expires_at: float, response: str):
+        self.memory[key] = (expires_at, response)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            disk_entries = self.db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self.memory),
+                "disk_entries": disk_entries
+            }
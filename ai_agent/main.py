@@ -1,23 +1,47 @@
+import time
+# measured before anything else is imported, see the import time budget check below
+import_started = time.perf_counter()
 from dotenv import load_dotenv
 import os
-from fastapi import FastAPI,HTTPException, UploadFile, File, Form, Request
+from fastapi import FastAPI,HTTPException, UploadFile, File, Form, Request, Header
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Optional
-from submit_on_boarding_service import run_langgraph, QAState,event_stream
+from typing import List, Dict, Optional, BinaryIO
+from submit_on_boarding_service import arun_langgraph, QAState,event_stream,bind_event_loop
+from submit_on_boarding_service import submit_on_boarding_node_count
 from fastapi.responses import StreamingResponse
-import aiohttp
+from starlette.datastructures import UploadFile as StarletteUploadFile
 import asyncio
 import base64
 import json
-import google.generativeai as genai
 import uuid
-from submit_on_boarding_service import fetch_content,build_user_prompt,call_ai_model
-from supervisor_agent import run_workflow_step1_sync, run_workflow_step2, store_workflow_state, get_workflow_state, delete_workflow_state
+from submit_on_boarding_service import build_user_prompt,acall_ai_model,UIChunkStreamer,current_workflow_id
+from clients import get_gemini_model, get_llm_cache, get_classification_cache, get_content_cache
+from llm_cache import classification_cache_key
+from rcc_rules import detect_conflicts, prune_rules
+from graph_registry import graph_registry
+from http_session import http_session
+from fan_out import fan_out, post_with_retry
+from upload_stream import read_chunks, describe_upload, without_file
+from job_queue import JobManager, JobQueueFull
+from chat_history import build_history, record_turn, to_contents, prompt_tokens
+from questionnaire import QUESTIONS, QUESTION_TEXTS, validation_rules_text
+import state_store
+from state_store import StateStore, create_store
+from supervisor_agent import run_workflow_step1, run_workflow_step2, get_workflow_state, delete_workflow_state, astore_workflow_state, aget_workflow_state, adelete_workflow_state
 
 # Load environment variables
 load_dotenv()
 
+# Importing the app must not touch the network or initialise SDK clients (they are created on first use),
+# so a worker (and every --reload) starts quickly and offline
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", 1.0))
+import_seconds = time.perf_counter() - import_started
+if import_seconds > IMPORT_TIME_BUDGET_SECONDS:
+    print(f"WARNING: importing the app took {import_seconds:.2f}s, over the {IMPORT_TIME_BUDGET_SECONDS:.2f}s budget")
+else:
+    print(f"Imported the app in {import_seconds:.2f}s")
+
 # API Configuration
 class APIConfig:
     def __init__(self):
@@ -33,6 +57,13 @@ class APIConfig:
 
 api_config = APIConfig()
 
+# /questionare submissions run in the background, at most JOB_MAX_RUNNING pipelines at a time
+job_manager = JobManager(
+    max_running=int(os.getenv("JOB_MAX_RUNNING", 2)),
+    max_queued=int(os.getenv("JOB_MAX_QUEUED", 50)),
+    history_size=int(os.getenv("JOB_HISTORY_SIZE", 200))
+)
+
 app = FastAPI()
 
 app.add_middleware(
@@ -43,31 +74,78 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def capture_event_loop():
+    # graph nodes running in worker threads publish SSE events through this loop
+    bind_event_loop(asyncio.get_running_loop())
 
-rule_file = os.getenv("RULES_YML") 
+@app.on_event("startup")
+def compile_graphs():
+    # compile every registered LangGraph graph once instead of on each request
+    graph_registry.compile_all()
 
-# Set up Gemini API
-GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+@app.on_event("startup")
+async def open_http_session():
+    # one pooled session for every document classification API call
+    await http_session.start()
 
-# =================== On Board Questionare =====================
+@app.on_event("startup")
+async def start_state_store_sweeper():
+    # expired sessions, questionares and workflow states are also dropped lazily on read
+    global state_store_sweeper
+    state_store_sweeper = asyncio.create_task(state_store.run_sweeper())
+
+@app.on_event("shutdown")
+async def close_http_session():
+    await http_session.close()
 
+@app.on_event("shutdown")
+async def stop_state_store_sweeper():
+    if state_store_sweeper is not None:
+        state_store_sweeper.cancel()
 
-# In-memory state
-sessions = {}
+state_store_sweeper: Optional[asyncio.Task] = None
 
-# Define list of questions
-questions = [
-    "Enter On Boarding Name",
-    "Enter Partition ? (P0, P1, P2, P3, P4, P5)",
-    "Enter Eligible SOR Codes ? (Example: ACCT/SOR,DEAL/SOR)",
-    "Enter BUS UNIT",
-    "Enter RCC RULES",
-    "Enter Sampling Rule Ref",
-    'Enter Sampling Id',
-    'Enter Sampling Data'
-]
+@app.get("/state-store/stats")
+def get_state_store_stats():
+    return state_store.stats()
+
+
+rule_file = os.getenv("RULES_YML") 
+
+# =================== On Board Questionare =====================
+
+
+# Chat sessions keep a bounded Gemini chat history instead of the chat object, so they can live in any state store backend
+chat_sessions: StateStore[Dict] = create_store("chat_sessions", ttl_seconds=float(os.getenv("CHAT_SESSION_TTL_SECONDS", 2 * 60 * 60)))
+
+def send_chat_message(session_id: str, session: Dict, message: str):
+    """Send one turn on top of the pinned instructions, the answered so far summary and the current question's turns"""
+    convo = get_gemini_model().start_chat(history=build_history(session, questions))
+    response = convo.send_message(message)
+    tokens = prompt_tokens(response)
+    session["prompt_tokens"].append(tokens)
+    print(f"chat {session_id} turn {len(session['prompt_tokens'])}: {tokens} prompt tokens")
+    return convo, tokens
+
+# Define list of questions (shared with the supervisor workflow)
+questions = QUESTION_TEXTS
+
+def check_answer(session_id: str, session: Dict, index: int, answer: str, llm_message: str):
+    """Validate an answer locally, free text answers that pass are also judged by Gemini (sent as llm_message).
+    Returns the bot response, the turn's prompt tokens (None when Gemini was not called) and whether the answer is valid."""
+    question = QUESTIONS[index]
+    error = question.validate(answer, {i: previous["user"] for i, previous in enumerate(session["answers"]) if previous})
+    if error:
+        return f"{error} Please re-enter: {question.text}", None, False
+    if not question.needs_llm:
+        return f"{question.text}: {answer.strip()} accepted.", None, True
+
+    convo, tokens = send_chat_message(session_id, session, llm_message)
+    bot_response = convo.last.text
+    valid = not ("invalid" in bot_response.lower() or "please re-enter" in bot_response.lower())
+    record_turn(session, convo, question_done=valid)
+    return bot_response, tokens, valid
 
 class UserMessage(BaseModel):
     session_id: str
@@ -76,8 +154,7 @@ class UserMessage(BaseModel):
 
 @app.post("/start")
 def start_conversation():
-    convo = model.start_chat(history=[])
-    session_id = str(id(convo))
+    session_id = str(uuid.uuid4())
 
     questions_text = "\n".join([f"{i+1}. {q}" for i, q in enumerate(questions)])
 
@@ -86,8 +163,8 @@ def start_conversation():
         Wait for the user's response before continuing. 
 
         ### Validation Rules:
-        - **Partition**: Only accept one of P0, P1, P2, P3, P4, P5. Reject and re-ask if invalid.
-        - **SOR Codes**: Must follow this format: ACCT/SOR,DEAL/SOR (one or more items, comma-separated).
+{validation_rules_text()}
+        Answers with a strict format are validated before they reach you and are listed as answered so far.
 
         ### Behavior:
         - If an answer is invalid, **explain the error** and **re-ask the same question**.
@@ -98,24 +175,27 @@ def start_conversation():
         """
 
 
-    convo.send_message(prompt)
-    sessions[session_id] = {
-        "convo": convo,
+    session = {
+        "pinned": [],
+        "turns": [],
+        "prompt_tokens": [],
         "answers": [None] * len(questions),
         "index": 0,
         "confirmed": False,
         "history": [[] for _ in questions]
     }
-    return {"session_id": session_id, "question": convo.last.text}
+    convo, tokens = send_chat_message(session_id, session, prompt)
+    # the instructions and the first question stay pinned at the start of every later turn
+    session["pinned"] = to_contents(convo.history)
+    chat_sessions.put(session_id, session)
+    return {"session_id": session_id, "question": convo.last.text, "prompt_tokens": tokens}
 
 
 @app.post("/message")
 def process_message(user_msg: UserMessage):
-    session = sessions.get(user_msg.session_id)
+    session = chat_sessions.get(user_msg.session_id)
     if not session:
         return {"error": "Invalid session"}
-    
-    convo = session["convo"]
 
     # User confirmed their answers
     if "confirm" in user_msg.message.lower():
@@ -124,7 +204,7 @@ def process_message(user_msg: UserMessage):
             "questions": questions,
             "answers": formatted_answers
         }
-        del sessions[user_msg.session_id]  # clear session after confirmation
+        chat_sessions.delete(user_msg.session_id)  # clear session after confirmation
         return {
             "response": "Thank you! Your responses have been confirmed and sent for review.",
             "final_output": final_output
@@ -135,47 +215,54 @@ def process_message(user_msg: UserMessage):
         index = user_msg.edit_index
         question = questions[index]
 
-        # Tell Gemini what is being edited
-        convo.send_message(f"Revisiting this question:\n{question}\nUser answered: {user_msg.message}")
-        bot_response = convo.last.text
+        # Tell Gemini what is being edited, when the question needs its judgment
+        bot_response, tokens, valid = check_answer(user_msg.session_id, session, index, user_msg.message,
+                                                   f"Revisiting this question:\n{question}\nUser answered: {user_msg.message}")
 
         # Check if invalid
-        if "invalid" in bot_response.lower() or "please re-enter" in bot_response.lower():
+        if not valid:
+            chat_sessions.put(user_msg.session_id, session)
             return {
                 "response": bot_response,
-                "question": questions[index]
+                "question": questions[index],
+                "prompt_tokens": tokens
             }
 
         # Save new answer and update history
         session["answers"][index] = {"user": user_msg.message, "bot": bot_response}
         session["history"][index].append(user_msg.message)
+        chat_sessions.put(user_msg.session_id, session)
 
         return {
             "response": bot_response,
             "preview": session["answers"],
-            "history": session["history"]
+            "history": session["history"],
+            "prompt_tokens": tokens
         }
 
     # Normal (non-edit) flow
     index = session["index"]
+    tokens = None
 
-    convo.send_message(user_msg.message)
-    bot_response = convo.last.text
+    if 0 <= index < len(questions):
+        bot_response, tokens, valid = check_answer(user_msg.session_id, session, index, user_msg.message, user_msg.message)
 
-    # If answer is invalid
-    if "invalid" in bot_response.lower() or "please re-enter" in bot_response.lower():
-        return {
-            "response": bot_response,
-            "question": questions[index]
-        }
+        # If answer is invalid
+        if not valid:
+            chat_sessions.put(user_msg.session_id, session)
+            return {
+                "response": bot_response,
+                "question": questions[index],
+                "prompt_tokens": tokens
+            }
 
-    # Save valid answer
-    if 0 <= index < len(questions):
+        # Save valid answer
         session["answers"][index] = {"user": user_msg.message, "bot": bot_response}
         session["history"][index].append(user_msg.message)
 
-    # Move to next question
-    session["index"] += 1
+        # Move to next question, its answer now only appears in the answered so far summary
+        session["index"] += 1
+        chat_sessions.put(user_msg.session_id, session)
 
     # If all questions answered, show preview
     if session["index"] >= len(questions):
@@ -187,12 +274,14 @@ def process_message(user_msg: UserMessage):
             "json_output": {
                 "questions": questions,
                 "answers": formatted_answers
-            }
+            },
+            "prompt_tokens": tokens
         }
 
     # Otherwise, continue to next question
     return {
-        "response": questions[session["index"]]
+        "response": questions[session["index"]],
+        "prompt_tokens": tokens
     }
 
 
@@ -202,100 +291,91 @@ class VerifyQAInput(BaseModel):
     questions: List[str]
     answers: Dict[int, str]
 
-verify_qa_store = {
-}
+verify_qa_store: StateStore[VerifyQAInput] = create_store(
+    "verify_qa",
+    ttl_seconds=float(os.getenv("QA_STORE_TTL_SECONDS", 7 * 24 * 60 * 60)),
+    encode=lambda data: data.dict(),
+    decode=lambda data: VerifyQAInput(**data)
+)
 
 @app.post("/store_verify_qa")
 def store_qa(data: VerifyQAInput):
     session_id = str(uuid.uuid4())
-    verify_qa_store[session_id] = data
+    verify_qa_store.put(session_id, data)
     return {"session_id": session_id, "message": "QA data stored successfully"}
 
 
 @app.put("/store_verify_qa/{session_id}")
 def store_qa(session_id: str,data: VerifyQAInput):
-    verify_qa_store[session_id] = data
+    verify_qa_store.put(session_id, data)
     return {"session_id": session_id, "message": "QA data stored successfully"}
 
 @app.get("/all_verify_qa")
 def get_verify_all_qa():
-    return verify_qa_store
+    return verify_qa_store.all()
 
 @app.get("/verify-qa/{session_id}/{branch_name}")
-def verify_qa(session_id: str,branch_name:str):
-    print(verify_qa_store)
-    questionare = verify_qa_store.get(str(session_id))
-    data: QAState = {
-        "questions": questionare.questions,
-        "answers": questionare.answers,
-        "branch": branch_name
-    }
-    print(data)
-    print("=================")
-    rules = fetch_content(branch_name,rule_file)
+async def verify_qa(session_id: str,branch_name:str,explain: bool = False,workflow_id: Optional[str] = None):
+    questionare = await verify_qa_store.aget(str(session_id))
+    if not questionare:
+        raise HTTPException(status_code=404, detail="Questionare not found")
+    # a fetch error must not look like an empty rules file, which would report no conflicts
+    try:
+        rules = await asyncio.to_thread(get_content_cache().fetch, branch_name, rule_file)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch {rule_file} from {branch_name}: {e}")
+
+    # Conflicts are found by exact key matching, the LLM is only asked to explain them on request
+    conflicts = detect_conflicts(questionare.questions, questionare.answers, rules)
+    if explain and conflicts:
+        # the explanation streams to /events?workflow_id=<workflow_id> as llm_chunk events while it is generated
+        token = current_workflow_id.set(workflow_id)
+        try:
+            return await explain_conflicts(questionare, conflicts, rules)
+        finally:
+            current_workflow_id.reset(token)
+    return json.dumps(conflicts)
+
+async def explain_conflicts(questionare: VerifyQAInput, conflicts: List[Dict], rules: str) -> str:
+    # Only the rule types and COUNTRY prefixes relevant to the input are sent as context
+    rules_slice, tokens_saved = prune_rules(rules, questionare.questions, questionare.answers)
+    print(f"verify rules context pruned, ~{tokens_saved} tokens saved")
     system_prompt = f"""
-        You are an expert onboarding verification assistant.  Your task is to identify RCC rule conflicts based on provided data.  Follow these steps precisely:
-
-**Data:**
+        You are an expert onboarding verification assistant. The RCC rule conflicts below were detected by
+        comparing [COUNTRY|LOB|TYPE|DOC_CAT|DOC_TYPE] and [COUNTRY|INV_REF] keys built from the "RCC RULES" INPUT DATA
+        with the existing rules.
 
         Partions Info:
             P0 is Federated
             P1 to P4 are non Regulated
             P5 is Regulated
 
-        Rule Types Description :
-            non_regulated_rccRule (when Partition is non Regulated and COUNTRY|LOB|TYPE|DOC_CAT|DOC_TYPE have data from "RCC RULES" INPUT DATA),
-            inv_ref_id_rccRule (when Partition is Regulated and COUNTRY|INV_REF have data from "RCC RULES" INPUT DATA),
-            non_regulated_inv_ref_id_rccRule  (when Partition is non Regulated and COUNTRY|INV_REF have data from "RCC RULES" from INPUT DATA)
- 
-        
-       
-
-**Conflict Detection Algorithm:**
+        You must:
+        - Keep every conflict and every field exactly as given
+        - Only rewrite "reasonForConflict" with a short explanation for the user
+        - Return the conflicts as a JSON array
 
-1. **Partition Determination:** Determine the partition type (Federated, Regulated, Non-Regulated) from the INPUT DATA's.
+        Conflicts:
+        \n\n{json.dumps(conflicts, indent=2)}
 
-2. **Rule Type Selection:** For each line in the "RCC RULES" input data (Q5), determine the appropriate rule type based on the populated fields and the partition type:
-    * `non_regulated_rccRule`:  Partition is Non-Regulated AND COUNTRY|LOB|TYPE|DOC_CAT|DOC_TYPE are populated.
-    * `inv_ref_id_rccRule`: Partition is Regulated AND COUNTRY|INV_REF are populated.
-    * `non_regulated_inv_ref_id_rccRule`: Partition is Non-Regulated AND COUNTRY|INV_REF are populated.
-
-3. **Key Generation:**  For each line, construct the key string based on the selected rule type's required fields.  Use square brackets `[]` and pipe symbols `|` as delimiters.  For example: `[US|LOB1|ACCT|11|11]` or `[US|123]`.
-
-4. **Conflict Detection:** Compare each generated key against the keys in the corresponding rule type within the "Existing Rules".  A conflict exists ONLY if:
-    * The key is should be exactly same (dont assume alike or similar) in both the "Existing Rules" and the "RCC RULES" input data and the RCC values are different.
-    * Double check while considering it as conflict.
-
-5. **Output:**  Report conflicts in the specified JSON format, including the original rule line, line number, existing RCC value, input RCC value and Reason for conflict.  If no conflicts are found, return an empty JSON array: `[]`.
-
-**Perform conflict detection using the provided data and algorithm.  Show your work by explicitly stating the rule type, key, and conflict determination for each line in the RCC RULES input data.**
-        
-        [
-            {{
-                "rule": "original CSV line from RCC RULES",
-                "lineNumber": "line number in RCC RULES input",
-                "existingRcc": "value in existing config",
-                "inputRcc": "value in input",
-                "reasonForConflict":"Provide reason for conflict"
-            }}
-        ]
-
-        \n\n 
         Existing Rules:
-        \n\n{rules}
-
-        \n\n
+        \n\n{rules_slice}
     """
+    data = {
+        "questions": questionare.questions,
+        "answers": questionare.answers
+    }
     user_prompt = build_user_prompt(data)
-    result = call_ai_model(system_prompt, user_prompt,"json")
-    return result
-
+    streamer = UIChunkStreamer("verify-qa")
+    explained = await acall_ai_model(system_prompt, user_prompt,"json",on_token=streamer)
+    streamer.flush()
+    return explained
 
 
 @app.delete("/verify_qa/{session_id}")
 def delete_verify_qa(session_id: str):
-    del verify_qa_store[session_id]
-    return verify_qa_store
+    verify_qa_store.delete(session_id)
+    return verify_qa_store.all()
 
 # =================== Submit Questionare =====================
 
@@ -306,32 +386,50 @@ class QAInput(BaseModel):
     base_branch: Optional[str] = None
     new_branch: Optional[str] = None
     jira_no: Optional[str] = None
+    workflow_id: Optional[str] = None
 
-submit_qa_store = {
-    
-}
+submit_qa_store: StateStore[QAInput] = create_store(
+    "submit_qa",
+    ttl_seconds=float(os.getenv("QA_STORE_TTL_SECONDS", 7 * 24 * 60 * 60)),
+    encode=lambda data: data.dict(),
+    decode=lambda data: QAInput(**data)
+)
 
 @app.post("/store_submit_qa")
 def store_qa(data: QAInput):
     session_id = str(uuid.uuid4())
-    submit_qa_store[session_id] = data
+    submit_qa_store.put(session_id, data)
     return {"session_id": session_id, "message": "QA data stored successfully"}
 
 @app.get("/all_submit_qa")
 def get_submit_all_qa():
-    return submit_qa_store
+    return submit_qa_store.all()
 
 
 @app.get("/events")
-async def sse_endpoint():
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+async def sse_endpoint(workflow_id: Optional[str] = None, last_event_id: Optional[str] = Header(None)):
+    # without workflow_id the client receives the events of every workflow
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(event_stream(workflow_id, resume_from), media_type="text/event-stream")
+
+@app.get("/llm-cache/stats")
+def get_llm_cache_stats():
+    return get_llm_cache().stats()
+
+@app.get("/classification-cache/stats")
+def get_classification_cache_stats():
+    return get_classification_cache().stats()
+
+@app.get("/graphs/stats")
+def get_graph_stats():
+    return graph_registry.stats()
 
 @app.get("/")
 def read_root():
     return {"message": "Hello, FastAPI!"}
 
-@app.post("/questionare")
-def submit_qa(data: QAInput):
+@app.post("/questionare", status_code=202)
+async def submit_qa(data: QAInput):
     state: QAState = {
         "questions": data.questions,
         "index": 0,
@@ -339,6 +437,7 @@ def submit_qa(data: QAInput):
         "command": "",
         "base_branch":data.base_branch,
         "branch_name": data.new_branch,
+        "base_sha": "",
         "jira_no": data.jira_no,
         "sor_codes_content": "",
         "updated_sor_codes": "",
@@ -350,108 +449,182 @@ def submit_qa(data: QAInput):
         "test_case_report": ""
     }
 
-    result = run_langgraph(state)
-    return {"status": "completed", "final_state": result}
+    # events of this run are published on /events?workflow_id=<workflow_id or new_branch>
+    workflow_id = data.workflow_id or data.new_branch
+    # the pipeline runs as a background job, its status and final state are served by GET /jobs/{job_id}
+    async def run_submit(job):
+        final_state = await arun_langgraph(state, workflow_id, on_node=job.node_completed)
+        if final_state.get("abort"):
+            raise RuntimeError("Submit on-boarding aborted, no changes were committed")
+        return final_state
+
+    try:
+        job = job_manager.submit(
+            run_submit,
+            workflow_id,
+            submit_on_boarding_node_count()
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"status": job.status, "job_id": job.id, "workflow_id": workflow_id}
+
+@app.get("/jobs")
+async def get_jobs_stats():
+    return job_manager.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @app.delete("/submit_qa/{session_id}")
 def delete_submit_qa(session_id: str):
-    del submit_qa_store[session_id]
-    return submit_qa_store
+    submit_qa_store.delete(session_id)
+    return submit_qa_store.all()
 
     
 # =================== File Upload =====================
 
-async def call_external_api(file_content: bytes, filename: str) -> Dict:
+async def call_external_api(file: BinaryIO, filename: str, sha256: Optional[str] = None) -> Dict:
     """
-    Call external API with basic auth for a single file
+    Call external API with basic auth for a single file, answered from the classification cache
+    when the same content was classified before
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            # Prepare the request data
-            data = aiohttp.FormData()
-            data.add_field('file', file_content, filename=filename)
+        url = f"{api_config.base_url}{api_config.endpoint}"
+        cache_key = classification_cache_key(sha256, "", "", url) if sha256 else None
+        if cache_key and (cached := await get_classification_cache().aget(cache_key)) is not None:
+            return {
+                "filename": filename,
+                "status": "success",
+                "api_response": json.loads(cached),
+                "attempts": 0,
+                "cached": True
+            }
+        
+        async with http_session.scope() as session:
+            # Prepare the request data (rebuilt for every attempt), the file is streamed from its start in chunks
+            def build_data():
+                import aiohttp
+                data = aiohttp.FormData()
+                data.add_field('file', read_chunks(file), filename=filename)
+                return data
             
-            # Make the API call with basic auth
+            # Make the API call with basic auth (aiohttp sets the multipart Content-Type with its boundary)
             headers = {
-                'Authorization': api_config.get_auth_header(),
-                'Content-Type': 'multipart/form-data'
+                'Authorization': api_config.get_auth_header()
             }
             
-            url = f"{api_config.base_url}{api_config.endpoint}"
-            
-            async with session.post(url, data=data, headers=headers) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return {
-                        "filename": filename,
-                        "status": "success",
-                        "api_response": result
-                    }
-                else:
-                    error_text = await response.text()
-                    return {
-                        "filename": filename,
-                        "status": "error",
-                        "error": f"API returned status {response.status}: {error_text}"
-                    }
+            status, result, attempts = await post_with_retry(session, url, build_data, headers)
+            if status == 200:
+                if cache_key:
+                    await get_classification_cache().aput(cache_key, json.dumps(result))
+                return {
+                    "filename": filename,
+                    "status": "success",
+                    "api_response": result,
+                    "attempts": attempts,
+                    "cached": False
+                }
+            else:
+                return {
+                    "filename": filename,
+                    "status": "error",
+                    "error": f"API returned status {status}: {result}",
+                    "attempts": attempts,
+                    "cached": False
+                }
                     
     except Exception as e:
         return {
             "filename": filename,
             "status": "error",
-            "error": f"Exception occurred: {str(e)}"
+            "error": f"Exception occurred: {str(e)}",
+            "attempts": getattr(e, "attempts", 1),
+            "cached": False
         }
 
-async def call_external_api_with_metadata(file_content: bytes, filename: str, country: str = "US", acct_sor: str = "") -> Dict:
+async def call_external_api_with_metadata(file: BinaryIO, filename: str, country: str = "US", acct_sor: str = "", sha256: Optional[str] = None) -> Dict:
     """
-    Call external API with basic auth for a single file, including metadata
+    Call external API with basic auth for a single file, including metadata.
+    Files already classified (same sha256, country and acct_sor) are answered from the classification cache
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            # Prepare the request data with metadata
-            data = aiohttp.FormData()
-            data.add_field('file', file_content, filename=filename)
-            data.add_field('country', country)
-            data.add_field('acct_sor', acct_sor)
+        url = f"{api_config.base_url}{api_config.endpoint}"
+        cache_key = classification_cache_key(sha256, country, acct_sor, url) if sha256 else None
+        if cache_key and (cached := await get_classification_cache().aget(cache_key)) is not None:
+            return {
+                "filename": filename,
+                "status": "success",
+                "api_response": json.loads(cached),
+                "attempts": 0,
+                "cached": True,
+                "metadata": {
+                    "country": country,
+                    "acct_sor": acct_sor
+                }
+            }
+        
+        async with http_session.scope() as session:
+            # Prepare the request data with metadata (rebuilt for every attempt), the file is streamed in chunks
+            def build_data():
+                import aiohttp
+                data = aiohttp.FormData()
+                data.add_field('file', read_chunks(file), filename=filename)
+                data.add_field('country', country)
+                data.add_field('acct_sor', acct_sor)
+                return data
             
-            # Make the API call with basic auth
+            # Make the API call with basic auth (aiohttp sets the multipart Content-Type with its boundary)
             headers = {
-                'Authorization': api_config.get_auth_header(),
-                'Content-Type': 'multipart/form-data'
+                'Authorization': api_config.get_auth_header()
             }
             
-            url = f"{api_config.base_url}{api_config.endpoint}"
-            
-            async with session.post(url, data=data, headers=headers) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return {
-                        "filename": filename,
-                        "status": "success",
-                        "api_response": result,
-                        "metadata": {
-                            "country": country,
-                            "acct_sor": acct_sor
-                        }
+            status, result, attempts = await post_with_retry(session, url, build_data, headers)
+            if status == 200:
+                if cache_key:
+                    await get_classification_cache().aput(cache_key, json.dumps(result))
+                return {
+                    "filename": filename,
+                    "status": "success",
+                    "api_response": result,
+                    "attempts": attempts,
+                    "cached": False,
+                    "metadata": {
+                        "country": country,
+                        "acct_sor": acct_sor
                     }
-                else:
-                    error_text = await response.text()
-                    return {
-                        "filename": filename,
-                        "status": "error",
-                        "error": f"API returned status {response.status}: {error_text}",
-                        "metadata": {
-                            "country": country,
-                            "acct_sor": acct_sor
-                        }
+                }
+            else:
+                return {
+                    "filename": filename,
+                    "status": "error",
+                    "error": f"API returned status {status}: {result}",
+                    "attempts": attempts,
+                    "cached": False,
+                    "metadata": {
+                        "country": country,
+                        "acct_sor": acct_sor
                     }
+                }
                     
     except Exception as e:
         return {
             "filename": filename,
             "status": "error",
             "error": f"Exception occurred: {str(e)}",
+            "attempts": getattr(e, "attempts", 1),
+            "cached": False,
             "metadata": {
                 "country": country,
                 "acct_sor": acct_sor
@@ -474,8 +647,8 @@ async def upload_files(request: Request):
         
         for key, value in form_data.items():
             if key.startswith('file') and not key.endswith(('_country', '_acctSor')):
-                # This is a file
-                if isinstance(value, UploadFile):
+                # This is a file (request.form() yields Starlette's UploadFile, FastAPI's is a subclass of it)
+                if isinstance(value, StarletteUploadFile):
                     files.append(value)
             elif key in ['totalFiles', 'uploadTimestamp']:
                 # Global metadata
@@ -487,41 +660,29 @@ async def upload_files(request: Request):
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
         
-        # Read all files and associate with metadata
+        # Hash each file and associate with metadata, the content stays in the spooled upload
         file_data = []
         for i, file in enumerate(files):
             try:
-                content = await file.read()
-                
                 # Extract file-specific metadata
                 country = metadata.get(f'file{i}_country', 'US')
                 acct_sor = metadata.get(f'file{i}_acctSor', '')
                 
-                file_data.append({
-                    "content": content,
-                    "filename": file.filename,
-                    "content_type": file.content_type,
-                    "size": len(content),
-                    "index": i,
-                    "country": country,
-                    "acct_sor": acct_sor
-                })
+                file_data.append(await describe_upload(file, index=i, country=country, acct_sor=acct_sor))
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Error reading file {file.filename}: {str(e)}")
         
-        # Call external API for each file in parallel
-        tasks = []
-        for file_info in file_data:
-            task = call_external_api_with_metadata(
-                file_info["content"], 
+        # Call external API for each file in parallel, at most FAN_OUT_CONCURRENCY at a time
+        api_results = await fan_out(
+            file_data,
+            lambda file_info: call_external_api_with_metadata(
+                file_info["file"], 
                 file_info["filename"],
                 file_info["country"],
-                file_info["acct_sor"]
+                file_info["acct_sor"],
+                file_info["sha256"]
             )
-            tasks.append(task)
-        
-        # Wait for all API calls to complete
-        api_results = await asyncio.gather(*tasks, return_exceptions=True)
+        )
         
         # Process results and handle exceptions
         processed_results = []
@@ -544,7 +705,9 @@ async def upload_files(request: Request):
             "summary": {
                 "total_files": len(files),
                 "successful": len(successful_files),
-                "failed": len(failed_files)
+                "failed": len(failed_files),
+                "retried": len([r for r in processed_results if r.get("attempts", 1) > 1]),
+                "cached": len([r for r in processed_results if r.get("cached")])
             },
             "results": processed_results,
             "successful_files": successful_files,
@@ -563,20 +726,16 @@ async def upload_single_file(file: UploadFile = File(...)):
     Accept a single file uploaded from UI and call external API
     """
     try:
-        # Read file content
-        content = await file.read()
+        # Hash the file, its content is streamed to the external API from the spooled upload
+        file_info = without_file(await describe_upload(file))
         
         # Call external API
-        api_result = await call_external_api(content, file.filename)
+        api_result = await call_external_api(file.file, file.filename, file_info["sha256"])
         
         # Prepare response
         response = {
             "message": "File processed",
-            "file_info": {
-                "filename": file.filename,
-                "content_type": file.content_type,
-                "size": len(content)
-            },
+            "file_info": file_info,
             "api_result": api_result
         }
         
@@ -611,8 +770,8 @@ async def start_supervisor_workflow(request: Request):
         
         for key, value in form_data.items():
             if key.startswith('file') and not key.endswith(('_country', '_acctSor')):
-                # This is a file
-                if isinstance(value, UploadFile):
+                # This is a file (request.form() yields Starlette's UploadFile, FastAPI's is a subclass of it)
+                if isinstance(value, StarletteUploadFile):
                     files.append(value)
             elif key in ['totalFiles', 'uploadTimestamp']:
                 # Global metadata
@@ -627,32 +786,24 @@ async def start_supervisor_workflow(request: Request):
         # Generate workflow ID
         workflow_id = str(uuid.uuid4())
         
-        # Read all files and associate with metadata
+        # Hash each file and associate with metadata, the content stays in the spooled upload
+        # (only the metadata and hash end up in the workflow state)
         file_data = []
         for i, file in enumerate(files):
             try:
-                content = await file.read()
-                
                 # Extract file-specific metadata
                 country = metadata.get(f'file{i}_country', 'US')
                 acct_sor = metadata.get(f'file{i}_acctSor', '')
                 
-                file_data.append({
-                    "content": content,
-                    "filename": file.filename,
-                    "content_type": file.content_type,
-                    "size": len(content),
-                    "country": country,
-                    "acct_sor": acct_sor
-                })
+                file_data.append(await describe_upload(file, country=country, acct_sor=acct_sor))
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Error reading file {file.filename}: {str(e)}")
         
         # Run workflow steps 1 and 2 (Agent 1 -> Agent 2)
-        workflow_result = run_workflow_step1_sync(file_data, workflow_id)
+        workflow_result = await run_workflow_step1(file_data, workflow_id)
         
         # Store workflow state for later use
-        store_workflow_state(workflow_id, workflow_result)
+        await astore_workflow_state(workflow_id, workflow_result)
         
         return {
             "workflow_id": workflow_id,
@@ -667,7 +818,7 @@ async def start_supervisor_workflow(request: Request):
         raise HTTPException(status_code=500, detail=f"Supervisor workflow failed: {str(e)}")
 
 @app.post("/supervisor-workflow/proceed")
-def proceed_supervisor_workflow(data: WorkflowProceedInput):
+async def proceed_supervisor_workflow(data: WorkflowProceedInput):
     """
     Proceed to Agent 3 after UI confirmation
     """
@@ -675,13 +826,13 @@ def proceed_supervisor_workflow(data: WorkflowProceedInput):
         workflow_id = data.workflow_id
         
         # Get previous workflow state
-        previous_state = get_workflow_state(workflow_id)
+        previous_state = await aget_workflow_state(workflow_id)
         if not previous_state:
             raise HTTPException(status_code=404, detail="Workflow not found")
         
         if not data.proceed:
             # UI decided not to proceed
-            delete_workflow_state(workflow_id)
+            await adelete_workflow_state(workflow_id)
             return {
                 "workflow_id": workflow_id,
                 "status": "cancelled",
@@ -697,10 +848,10 @@ def proceed_supervisor_workflow(data: WorkflowProceedInput):
             ui_response += f" with QAInput data: {qa_data.dict()}"
         
         # Run workflow step 3 (Agent 3)
-        final_result = run_workflow_step2(workflow_id, ui_response, previous_state, qa_data)
+        final_result = await run_workflow_step2(workflow_id, ui_response, previous_state, qa_data)
         
         # Clean up workflow state
-        delete_workflow_state(workflow_id)
+        await adelete_workflow_state(workflow_id)
         
         return {
             "workflow_id": workflow_id,
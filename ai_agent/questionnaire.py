@@ -0,0 +1,80 @@
+from typing import Callable, Dict, List, Optional
+import re
+from rcc_rules import FEDERATED, RULE_KEY_COLUMNS, get_answer, parse_rcc_rules, partition_type, rule_type_for
+from config_merge import parse_sampling_values
+
+# A validator returns an error message for an invalid answer, or None.
+# It also gets the answers given so far (by question index), for checks depending on earlier answers.
+Validator = Callable[[str, Dict], Optional[str]]
+
+class Question:
+    """One on-boarding question. Answers are checked locally by validator, questions with
+    needs_llm=True are free text and are also judged by the chat model once they pass."""
+
+    def __init__(self, text: str, rule: str, validator: Validator, needs_llm: bool = False):
+        self.text = text
+        self.rule = rule
+        self.validator = validator
+        self.needs_llm = needs_llm
+
+    def validate(self, answer: str, answers: Dict) -> Optional[str]:
+        if not (answer or "").strip():
+            return "An answer is required."
+        return self.validator(answer.strip(), answers)
+
+# --- Validators ---
+PARTITION_PATTERN = re.compile(r"^P[0-5]$", re.IGNORECASE)
+SOR_CODE_PATTERN = re.compile(r"^(ACCT|DEAL)/[A-Z0-9_\-]+$", re.IGNORECASE)
+
+def any_text(answer: str, answers: Dict) -> Optional[str]:
+    return None
+
+def validate_partition(answer: str, answers: Dict) -> Optional[str]:
+    if not PARTITION_PATTERN.match(answer):
+        return f"Invalid partition '{answer}', it must be one of P0, P1, P2, P3, P4, P5."
+    return None
+
+def validate_sor_codes(answer: str, answers: Dict) -> Optional[str]:
+    invalid = [item.strip() for item in answer.split(",") if not SOR_CODE_PATTERN.match(item.strip())]
+    if invalid:
+        return f"Invalid SOR codes {', '.join(repr(item) for item in invalid)}, use the format ACCT/SOR,DEAL/SOR."
+    return None
+
+def validate_rcc_rules(answer: str, answers: Dict) -> Optional[str]:
+    rows = parse_rcc_rules(answer)
+    if not rows:
+        return "Invalid RCC RULES, at least one rule line is required."
+    partition = partition_type(get_answer(QUESTION_TEXTS, answers, "Partition"))
+    for row in rows:
+        if not row.get("RCC"):
+            return f"Invalid RCC RULES line {row['lineNumber']} '{row['rule']}', the RCC column is empty."
+        # without a known partition any populated rule key is accepted, Federated partitions have no RCC rule types
+        if partition is None or partition == FEDERATED:
+            if not any(all(row.get(column) for column in columns) for columns in RULE_KEY_COLUMNS.values()):
+                return f"Invalid RCC RULES line {row['lineNumber']} '{row['rule']}', COUNTRY|LOB|TYPE|DOC_CAT|DOC_TYPE or COUNTRY|INV_REF must be filled."
+        elif rule_type_for(row, partition) is None:
+            return f"Invalid RCC RULES line {row['lineNumber']} '{row['rule']}', its populated columns do not match a {partition} rule type."
+    return None
+
+def validate_sampling_data(answer: str, answers: Dict) -> Optional[str]:
+    if not parse_sampling_values(answer):
+        return "Invalid Sampling Data, enter a comma or new line separated list of values."
+    return None
+
+# --- Schema ---
+# Question texts are matched by label (get_answer) in the submit service, so they must keep these labels
+QUESTIONS: List[Question] = [
+    Question("Enter On Boarding Name", "a meaningful on-boarding name", any_text, needs_llm=True),
+    Question("Enter Partition ? (P0, P1, P2, P3, P4, P5)", "only one of P0, P1, P2, P3, P4, P5", validate_partition),
+    Question("Enter Eligible SOR Codes ? (Example: ACCT/SOR,DEAL/SOR)", "format ACCT/SOR,DEAL/SOR (one or more items, comma-separated)", validate_sor_codes),
+    Question("Enter BUS UNIT", "a business unit name", any_text, needs_llm=True),
+    Question("Enter RCC RULES", "CSV lines COUNTRY,LOB,TYPE,DOC_CAT,DOC_TYPE,INV_REF,RCC with an optional #COUNTRY,... header", validate_rcc_rules),
+    Question("Enter Sampling Rule Ref", "any text", any_text),
+    Question("Enter Sampling Id", "any text", any_text),
+    Question("Enter Sampling Data", "comma or new line separated values", validate_sampling_data)
+]
+
+QUESTION_TEXTS: List[str] = [question.text for question in QUESTIONS]
+
+def validation_rules_text() -> str:
+    return "\n".join(f"- **{question.text}**: {question.rule}" for question in QUESTIONS)
@@ -0,0 +1,173 @@
+from typing import Dict, List, Any, Optional, Tuple
+from io import StringIO
+import csv
+import re
+from ruamel.yaml import YAML
+
+# Partions Info:
+#     P0 is Federated
+#     P1 to P4 are non Regulated
+#     P5 is Regulated
+FEDERATED = "Federated"
+NON_REGULATED = "Non-Regulated"
+REGULATED = "Regulated"
+
+NON_REGULATED_RCC_RULE = "non_regulated_rccRule"
+INV_REF_ID_RCC_RULE = "inv_ref_id_rccRule"
+NON_REGULATED_INV_REF_ID_RCC_RULE = "non_regulated_inv_ref_id_rccRule"
+
+RULE_TYPES = [NON_REGULATED_RCC_RULE, INV_REF_ID_RCC_RULE, NON_REGULATED_INV_REF_ID_RCC_RULE]
+
+# Columns that make up the key of each rule type
+RULE_KEY_COLUMNS = {
+    NON_REGULATED_RCC_RULE: ["COUNTRY", "LOB", "TYPE", "DOC_CAT", "DOC_TYPE"],
+    INV_REF_ID_RCC_RULE: ["COUNTRY", "INV_REF"],
+    NON_REGULATED_INV_REF_ID_RCC_RULE: ["COUNTRY", "INV_REF"]
+}
+
+# Column order assumed when the RCC RULES input has no header line
+DEFAULT_COLUMNS = ["COUNTRY", "LOB", "TYPE", "DOC_CAT", "DOC_TYPE", "INV_REF", "RCC"]
+
+# Rule types that can match an input line of each partition type
+PARTITION_RULE_TYPES = {
+    FEDERATED: [],
+    NON_REGULATED: [NON_REGULATED_RCC_RULE, NON_REGULATED_INV_REF_ID_RCC_RULE],
+    REGULATED: [INV_REF_ID_RCC_RULE]
+}
+
+def partition_type(partition: str) -> Optional[str]:
+    """Map a partition answer (P0 - P5) to Federated, Non-Regulated or Regulated"""
+    match = re.search(r"\bP([0-5])\b", (partition or "").upper())
+    if not match:
+        return None
+    if match.group(1) == "0":
+        return FEDERATED
+    if match.group(1) == "5":
+        return REGULATED
+    return NON_REGULATED
+
+def get_answer(questions: List[str], answers: Dict, label: str) -> str:
+    """Find the answer of the first question whose text contains label (answers may be keyed by int or str)"""
+    for i, question in enumerate(questions):
+        if label.lower() in question.lower():
+            answer = answers.get(i)
+            if answer is None:
+                answer = answers.get(str(i), "")
+            return answer or ""
+    return ""
+
+def parse_rcc_rules(rcc_rules: str) -> List[Dict[str, Any]]:
+    """Parse the RCC RULES answer (comma or pipe separated, optional #COUNTRY,... header) into one
+    dict per rule line holding the column values plus the original line and its line number."""
+    columns = DEFAULT_COLUMNS
+    parsed = []
+    lines = (rcc_rules or "").splitlines()
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        delimiter = "|" if "|" in line and "," not in line else ","
+        values = [v.strip() for v in next(csv.reader([line], delimiter=delimiter))]
+        if values and "COUNTRY" in values[0].lstrip("#").strip().upper():
+            columns = [v.lstrip("#").strip().upper() for v in values]
+            continue
+        row = {column: (values[i] if i < len(values) else "") for i, column in enumerate(columns)}
+        row["rule"] = line.strip()
+        row["lineNumber"] = line_number
+        parsed.append(row)
+    return parsed
+
+def rule_type_for(row: Dict[str, Any], partition: Optional[str]) -> Optional[str]:
+    """Select the rule type of an input line from the partition type and the populated columns"""
+    def populated(rule_type: str) -> bool:
+        return all(row.get(column) for column in RULE_KEY_COLUMNS[rule_type])
+
+    if partition == NON_REGULATED:
+        if populated(NON_REGULATED_RCC_RULE):
+            return NON_REGULATED_RCC_RULE
+        if populated(NON_REGULATED_INV_REF_ID_RCC_RULE):
+            return NON_REGULATED_INV_REF_ID_RCC_RULE
+    elif partition == REGULATED:
+        if populated(INV_REF_ID_RCC_RULE):
+            return INV_REF_ID_RCC_RULE
+    return None
+
+def build_key(row: Dict[str, Any], rule_type: str) -> str:
+    """Build the [COUNTRY|...] key of an input line for the given rule type"""
+    return "[" + "|".join(row.get(column, "") for column in RULE_KEY_COLUMNS[rule_type]) + "]"
+
+def normalize_key(key: Any) -> str:
+    key = str(key).strip()
+    if not key.startswith("["):
+        key = f"[{key}]"
+    return key
+
+def find_rule_maps(data: Any) -> Dict[str, Any]:
+    """Locate the rule type maps anywhere in the parsed rules YAML (usually under `rules:`)"""
+    found = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in RULE_TYPES and key not in found:
+                found[key] = value if value is not None else {}
+            elif isinstance(value, dict):
+                for nested_key, nested_value in find_rule_maps(value).items():
+                    found.setdefault(nested_key, nested_value)
+    return found
+
+def load_rule_indexes(rules_content: str) -> Dict[str, Dict[str, str]]:
+    """Parse the rules YAML into one hash index (normalized key -> RCC) per rule type"""
+    data = YAML(typ="safe").load(rules_content or "") or {}
+    indexes = {rule_type: {} for rule_type in RULE_TYPES}
+    for rule_type, rules in find_rule_maps(data).items():
+        if isinstance(rules, dict):
+            indexes[rule_type] = {normalize_key(k): "" if v is None else str(v) for k, v in rules.items()}
+    return indexes
+
+def detect_conflicts(questions: List[str], answers: Dict, rules_content: str) -> List[Dict[str, Any]]:
+    """Deterministic RCC conflict detection: partition -> rule type -> key -> exact match compare.
+    A conflict is an input key that already exists in its rule type with a different RCC value."""
+    partition = partition_type(get_answer(questions, answers, "Partition"))
+    rows = parse_rcc_rules(get_answer(questions, answers, "RCC RULES"))
+    indexes = load_rule_indexes(rules_content)
+
+    conflicts = []
+    for row in rows:
+        rule_type = rule_type_for(row, partition)
+        if not rule_type:
+            continue
+        key = build_key(row, rule_type)
+        existing_rcc = indexes[rule_type].get(key)
+        input_rcc = row.get("RCC", "")
+        if existing_rcc is not None and existing_rcc != input_rcc:
+            conflicts.append({
+                "rule": row["rule"],
+                "lineNumber": str(row["lineNumber"]),
+                "existingRcc": existing_rcc,
+                "inputRcc": input_rcc,
+                "reasonForConflict": f"Key {key} already exists in {rule_type} with RCC {existing_rcc}"
+            })
+    return conflicts
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) used to report prompt savings"""
+    return (len(text or "") + 3) // 4
+
+def prune_rules(rules_content: str, questions: List[str], answers: Dict) -> Tuple[str, int]:
+    """Keep only the rule types that can match the partition and the keys sharing a COUNTRY with the
+    RCC RULES input lines. Returns the pruned rules YAML and the estimated tokens saved."""
+    partition = partition_type(get_answer(questions, answers, "Partition"))
+    countries = {row["COUNTRY"] for row in parse_rcc_rules(get_answer(questions, answers, "RCC RULES")) if row.get("COUNTRY")}
+    indexes = load_rule_indexes(rules_content)
+
+    pruned = {}
+    for rule_type in PARTITION_RULE_TYPES.get(partition, RULE_TYPES):
+        pruned[rule_type] = {
+            key: rcc for key, rcc in indexes[rule_type].items()
+            if key[1:].split("|", 1)[0].rstrip("]") in countries
+        }
+
+    stream = StringIO()
+    yaml = YAML(typ="safe")
+    yaml.default_flow_style = False
+    yaml.dump({"rules": pruned}, stream)
+    pruned_content = stream.getvalue()
+    return pruned_content, max(estimate_tokens(rules_content) - estimate_tokens(pruned_content), 0)
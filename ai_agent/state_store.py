@@ -0,0 +1,237 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+from dotenv import load_dotenv
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+T = TypeVar("T")
+
+# "memory" (LRU + TTL, lost on restart) or "sqlite" (local file, survives restarts)
+STATE_STORE_BACKEND = os.getenv("STATE_STORE_BACKEND", "memory")
+STATE_STORE_PATH = os.getenv("STATE_STORE_PATH", ".state_store.sqlite3")
+STATE_STORE_MAX_ENTRIES = int(os.getenv("STATE_STORE_MAX_ENTRIES", 10000))
+STATE_STORE_SWEEP_SECONDS = float(os.getenv("STATE_STORE_SWEEP_SECONDS", 60))
+
+# --- Backends: raw (expires_at, JSON-able value) entries ---
+class MemoryBackend:
+    """In-memory LRU capped at max_entries, the least recently used entry is evicted first"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (expires_at, value, size in bytes)
+        self.entries: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self.size_bytes = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key: str, value: Any, expires_at: float):
+        size = len(json.dumps(value, default=str))
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (expires_at, value, size)
+            self.size_bytes += size
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evicted += 1
+
+    def delete(self, key: str):
+        with self.lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[2]
+
+    def items(self) -> List[Tuple[str, float, Any]]:
+        with self.lock:
+            return [(key, entry[0], entry[1]) for key, entry in self.entries.items()]
+
+    def expired_keys(self, now: float) -> List[str]:
+        with self.lock:
+            return [key for key, entry in self.entries.items() if entry[0] <= now]
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries), "size_bytes": self.size_bytes, "evicted": self.evicted}
+
+class SQLiteBackend:
+    """Local SQLite table shared by every store (one namespace each), values are stored as JSON.
+    Capped at max_entries per namespace, the least recently used rows are evicted first."""
+
+    def __init__(self, path: str, namespace: str, max_entries: int):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.evicted = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS state_store ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "last_used REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS state_store_expires_at ON state_store (namespace, expires_at)")
+        self.db.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT expires_at, value FROM state_store WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE state_store SET last_used = ? WHERE namespace = ? AND key = ?", (time.time(), self.namespace, key)
+            )
+            self.db.commit()
+            return row[0], json.loads(row[1])
+
+    def put(self, key: str, value: Any, expires_at: float):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO state_store (namespace, key, value, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, default=str), expires_at, time.time())
+            )
+            evicted = self.db.execute(
+                "DELETE FROM state_store WHERE namespace = ? AND key IN "
+                "(SELECT key FROM state_store WHERE namespace = ? ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries)
+            ).rowcount
+            self.evicted += max(evicted, 0)
+            self.db.commit()
+
+    def delete(self, key: str):
+        with self.lock:
+            self.db.execute("DELETE FROM state_store WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self.db.commit()
+
+    def items(self) -> List[Tuple[str, float, Any]]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key, expires_at, value FROM state_store WHERE namespace = ?", (self.namespace,)
+            ).fetchall()
+        return [(key, expires_at, json.loads(value)) for key, expires_at, value in rows]
+
+    def expired_keys(self, now: float) -> List[str]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key FROM state_store WHERE namespace = ? AND expires_at <= ?", (self.namespace, now)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            entries, size_bytes = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM state_store WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return {"entries": entries, "size_bytes": size_bytes, "evicted": self.evicted}
+
+# --- Typed store ---
+class StateStore(Generic[T]):
+    """Typed key/value store whose entries expire ttl_seconds after their last put.
+    Expired entries are dropped lazily on get and by the periodic sweeper. encode / decode convert
+    values to and from JSON-able data, on_expire(key) is called for every expired entry."""
+
+    def __init__(self, name: str, backend: Any, ttl_seconds: float,
+                 encode: Callable[[T], Any] = lambda value: value, decode: Callable[[Any], T] = lambda value: value,
+                 on_expire: Optional[Callable[[str], None]] = None):
+        self.name = name
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.encode = encode
+        self.decode = decode
+        self.on_expire = on_expire
+        self.expired = 0
+
+    def get(self, key: str) -> Optional[T]:
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            self._expire([key])
+            return None
+        return self.decode(entry[1])
+
+    def put(self, key: str, value: T):
+        self.backend.put(key, self.encode(value), time.time() + self.ttl_seconds)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    async def aget(self, key: str) -> Optional[T]:
+        """get from async code, a SQLite backend read runs in a worker thread"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: T):
+        """put from async code, a SQLite backend write runs in a worker thread"""
+        await asyncio.to_thread(self.put, key, value)
+
+    async def adelete(self, key: str):
+        await asyncio.to_thread(self.delete, key)
+
+    def all(self) -> Dict[str, T]:
+        now = time.time()
+        return {key: self.decode(value) for key, expires_at, value in self.backend.items() if expires_at > now}
+
+    def sweep(self) -> int:
+        expired_keys = self.backend.expired_keys(time.time())
+        self._expire(expired_keys)
+        return len(expired_keys)
+
+    def _expire(self, keys: List[str]):
+        for key in keys:
+            self.backend.delete(key)
+            self.expired += 1
+            if self.on_expire:
+                try:
+                    self.on_expire(key)
+                except Exception as e:
+                    print(f"Error expiring {self.name} {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self.backend).__name__, "ttl_seconds": self.ttl_seconds, "expired": self.expired, **self.backend.stats()}
+
+# Every store created by create_store, swept by run_sweeper and reported by stats
+stores: Dict[str, StateStore] = {}
+
+def create_store(name: str, ttl_seconds: float, max_entries: int = STATE_STORE_MAX_ENTRIES, **kwargs) -> StateStore:
+    """Create a store on the configured backend (STATE_STORE_BACKEND)"""
+    if STATE_STORE_BACKEND == "sqlite":
+        backend = SQLiteBackend(STATE_STORE_PATH, name, max_entries)
+    else:
+        backend = MemoryBackend(max_entries)
+    store = StateStore(name, backend, ttl_seconds, **kwargs)
+    stores[name] = store
+    return store
+
+def sweep_all() -> Dict[str, int]:
+    return {name: store.sweep() for name, store in stores.items()}
+
+async def run_sweeper(interval_seconds: float = STATE_STORE_SWEEP_SECONDS):
+    """Drop expired entries of every store periodically, until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            expired = await asyncio.to_thread(sweep_all)
+            if any(expired.values()):
+                print(f"Expired state store entries: {expired}")
+        except Exception as e:
+            print(f"Error sweeping state stores: {e}")
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: store.stats() for name, store in stores.items()}
@@ -1,18 +1,28 @@
 from dotenv import load_dotenv
 import os
-from github import Github
-from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, List, Dict
+from typing import TypedDict, List, Dict, Annotated, Optional, Callable
+import operator
 import re
-from openai import OpenAI
+import json
+import time
+import contextvars
+import threading
 import requests
 from requests.auth import HTTPBasicAuth
 import asyncio
-import google.generativeai as genai
+from config_merge import merge_sor_codes, merge_rules, merge_bu_on_boarding
+from rcc_rules import get_answer
+from llm_cache import cache_key
+from clients import OPENAI_MODEL, GEMINI_MODEL, get_repo, get_content_cache, get_openai_client, get_async_openai_client, get_gemini_model, get_llm_cache
+from event_bus import EventBroadcaster
+from graph_registry import graph_registry
 
 # Load environment variables
 load_dotenv()
 
+def merge_files(left: Dict[str, str], right: Dict[str, str]) -> Dict[str, str]:
+    return {**(left or {}), **(right or {})}
+
 # --- Define State Schema ---
 class QAState(TypedDict):
     questions: List[str]
@@ -21,6 +31,8 @@ class QAState(TypedDict):
     command: str
     branch_name: str
     base_branch: str
+    # commit the files are read at and the atomic commit is built on
+    base_sha: str
     jira_no: str
     sor_codes_content: str
     updated_sor_codes: str
@@ -28,18 +40,17 @@ class QAState(TypedDict):
     updated_rules: str
     bu_on_boarding_content: str
     updated_bu_on_boarding: str
-    abort: bool
+    # fetch nodes of the parallel branches may all flag an abort in the same step
+    abort: Annotated[bool, operator.or_]
     test_case_report: str
+    # file path -> updated content, staged by the parallel branches and committed once
+    pending_files: Annotated[Dict[str, str], merge_files]
+    # file path -> what was changed in it, for the commit message
+    change_notes: Annotated[Dict[str, str], merge_files]
 
 model = os.getenv("MODEL")
 
-# Set OpenAI API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# --- GitHub Setup ---
-g = Github(os.getenv("GITHUB_TOKEN"))
-repo = g.get_repo(os.getenv("GITHUB_REPO"))
+# The GitHub repo handle, OpenAI / Gemini clients and the LLM cache are created on first use (see clients.py)
 app_admin_service_url = os.getenv("APP_ADMIN_SERVICE_URL") 
 app_service_name = os.getenv("APP_SERVICE_NAME") 
 
@@ -49,35 +60,90 @@ bu_on_boarding_file = os.getenv("BU_ON_BOARDING_YML")
 
 test_url = os.getenv("TEST_CASES_URL")
 
-# Queue for SSE
-event_queue = asyncio.Queue() 
+# BU on-boarding is merged deterministically, set to true to let the LLM handle inputs the merger rejects
+bu_on_boarding_llm_fallback = os.getenv("BU_ON_BOARDING_LLM_FALLBACK", "false").lower() == "true"
+
+# Pub/sub for SSE, one channel per workflow
+event_broadcaster = EventBroadcaster(
+    maxsize=int(os.getenv("SSE_SUBSCRIBER_QUEUE_SIZE", 100)),
+    replay_size=int(os.getenv("SSE_REPLAY_SIZE", 200))
+)
+
+# Workflow the running graph belongs to, graph nodes (and their worker threads) inherit it
+current_workflow_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_workflow_id", default=None)
 
-async def event_stream():
-    while True:
-        data = await event_queue.get()
-        yield f"data: {data}\n\n"
-        event_queue.task_done()
+async def event_stream(workflow_id: Optional[str] = None, last_event_id: Optional[int] = None):
+    # ask the browser to reconnect quickly, it then sends Last-Event-ID and only missed events are replayed
+    yield "retry: 3000\n\n"
+    async for event_id, data in event_broadcaster.stream(workflow_id, last_event_id):
+        yield f"id: {event_id}\ndata: {json.dumps(data)}\n\n"
 
-async def notify(message):
-    await event_queue.put(message)
+# Loop of the server that owns the SSE subscriber queues, captured on startup
+server_loop: Optional[asyncio.AbstractEventLoop] = None
+unbound_publish_lock = threading.Lock()
+
+def bind_event_loop(loop: asyncio.AbstractEventLoop):
+    global server_loop
+    server_loop = loop
+
+def publish_event(event: dict):
+    """Hand an event to the broadcaster from any thread.
+    Graph nodes running in worker threads queue the publish on the server loop with call_soon_threadsafe,
+    which keeps the order events were produced in. On the loop thread it is published directly."""
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if server_loop is None or running_loop is server_loop or server_loop.is_closed():
+        # no server (e.g. langgraph dev) means there are no subscribers to hand over to
+        with unbound_publish_lock:
+            event_broadcaster.publish(event.get("workflowId"), event)
+    else:
+        server_loop.call_soon_threadsafe(event_broadcaster.publish, event.get("workflowId"), event)
 
 def stream_message_to_ui(message: str,type: str="msg",extraText: str =""):
     t = {
             'message' : message,
             'type' : type,
-            'extraText' : extraText
+            'extraText' : extraText,
+            'workflowId' : current_workflow_id.get()
         }
-    try:
-        loop = asyncio.get_running_loop()
-        loop.create_task(notify(t))
-    except RuntimeError:
-        # Fallback if not in an event loop (e.g., running in sync context)
-        asyncio.run(notify(t))
+    publish_event(t)
+
+# Event type of the partial LLM output forwarded while a completion is streaming
+LLM_CHUNK_EVENT = "llm_chunk"
+
+class UIChunkStreamer:
+    """Collects streamed LLM tokens and forwards them to the UI as llm_chunk events,
+    coalesced to at least min_chars characters or one event every max_interval seconds"""
+
+    def __init__(self, label: str, min_chars: int = 200, max_interval: float = 0.25):
+        self.label = label
+        self.min_chars = min_chars
+        self.max_interval = max_interval
+        self.buffer = []
+        self.buffered_chars = 0
+        self.last_sent = time.monotonic()
+
+    def __call__(self, token: str):
+        if not token:
+            return
+        self.buffer.append(token)
+        self.buffered_chars += len(token)
+        if self.buffered_chars >= self.min_chars or time.monotonic() - self.last_sent >= self.max_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            stream_message_to_ui("".join(self.buffer), LLM_CHUNK_EVENT, self.label)
+        self.buffer = []
+        self.buffered_chars = 0
+        self.last_sent = time.monotonic()
 
 # --- GitHub Helpers ---
 def check_if_branch_exists(branch_name: str) -> bool:
     try:
-        repo.get_branch(branch_name)
+        get_repo().get_branch(branch_name)
         return True
     except:
         return False
@@ -89,6 +155,7 @@ def create_base_branch(state: QAState) -> QAState:
 def create_base_branch_if_not_exists(state: QAState) -> str:
     base_branch = state.get("base_branch").strip()
     if not check_if_branch_exists(base_branch):
+        repo = get_repo()
         default_branch = repo.get_branch(repo.default_branch)
         repo.create_git_ref(ref=f"refs/heads/{base_branch}", sha=default_branch.commit.sha)
         print(f"Created base branch: {base_branch}")
@@ -102,6 +169,7 @@ def create_on_boarding_branch_if_not_exists(state: QAState,base_branch: str) ->
     print(f"base branch '{base_branch}'")
     new_branch_name = state.get("branch_name").strip()
     if not check_if_branch_exists(new_branch_name):
+        repo = get_repo()
         base_branch_1 = repo.get_branch(base_branch)
         repo.create_git_ref(ref=f"refs/heads/{new_branch_name}", sha=base_branch_1.commit.sha)
         print(f"Created on-boarding branch: {new_branch_name} from {base_branch}")
@@ -112,7 +180,7 @@ def create_on_boarding_branch_if_not_exists(state: QAState,base_branch: str) ->
     return new_branch_name
 
 def check_if_pr_exists(new_branch_name: str,base_branch :str) -> bool:
-    open_prs = repo.get_pulls(state="open", base=base_branch)
+    open_prs = get_repo().get_pulls(state="open", base=base_branch)
     for pr in open_prs:
         if pr.head.ref == new_branch_name:
             print(f"A PR from branch '{new_branch_name}' already exists.")
@@ -124,7 +192,7 @@ def create_pull_request(new_branch_name: str,base_branch: str,jira_no: str):
     pr_body = f"Pull request contains the onboarding details for {jira_no}"
     print(f"base branch '{base_branch}'")
     if not check_if_pr_exists(new_branch_name,base_branch):
-        pr = repo.create_pull(
+        pr = get_repo().create_pull(
             title=pr_title,
             body=pr_body,
             head=new_branch_name,
@@ -139,22 +207,31 @@ def create_pull_request(new_branch_name: str,base_branch: str,jira_no: str):
 # --- File Helpers ---
 def fetch_content(branch_name: str,file_path: str) -> str:
     try:
-        file = repo.get_contents(file_path, ref=branch_name)
-        return file.decoded_content.decode()
+        return get_content_cache().fetch(branch_name, file_path)
     except Exception as e:
         print(f"Error fetching onboarding file: {e}")
         return ""
 
-def update_or_create_file(updated_content: str, branch_name: str,file_path:str,jira_no:str):
-    commit_message = f"{jira_no} Update {file_path} with LLM-generated content"
-    try:
-        file = repo.get_contents(file_path, ref=branch_name)
-        file_sha = file.sha
-        repo.update_file(file_path, commit_message, updated_content, file_sha, branch=branch_name)
-        print(f"Updated {file_path} in branch {branch_name}")
-        stream_message_to_ui(f"Updated {file_path} in {branch_name} branch")
-    except Exception as e:
-        print(f"Error updating {file_path}: {e}")
+def commit_message_for(files: Dict[str, str], jira_no: str, change_notes: Optional[Dict[str, str]] = None) -> str:
+    """Summary line with the updated files, followed by what was changed in each of them"""
+    commit_message = f"{jira_no} Update {', '.join(files)}"
+    notes = [f"- {file_path}: {change_notes[file_path]}" for file_path in files if (change_notes or {}).get(file_path)]
+    if notes:
+        commit_message += "\n\n" + "\n".join(notes)
+    return commit_message
+
+def commit_files(files: Dict[str, str], branch_name: str, jira_no: str, base_sha: Optional[str] = None, change_notes: Optional[Dict[str, str]] = None):
+    """Commit every file at once on top of base_sha, raises when the commit could not be made"""
+    file_paths = ", ".join(files)
+    commit_message = commit_message_for(files, jira_no, change_notes)
+    # PyGithub is only imported once a commit is made, like the repo handle in clients.py
+    from github_commit_builder import CommitBuilder
+    builder = CommitBuilder(get_repo(), branch_name)
+    for file_path, content in files.items():
+        builder.add_file(file_path, content)
+    commit_sha = builder.commit(commit_message, base_sha)
+    print(f"Committed {file_paths} in branch {branch_name} ({commit_sha})")
+    stream_message_to_ui(f"Updated {file_paths} in {branch_name} branch")
 
 
 def extract_format_content(text: str, format: str) -> str:
@@ -166,39 +243,121 @@ def extract_format_content(text: str, format: str) -> str:
         return text.strip()
 
 # --- OPEN AI LLM Helpers ---
-def call_openai(system_prompt: str, user_prompt: str,format :str) -> str:
+def call_openai(system_prompt: str, user_prompt: str,format :str, on_token: Optional[Callable[[str], None]] = None) -> str:
    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = get_openai_client().chat.completions.create(
+        model=OPENAI_MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
-        ]
+        ],
+        stream=on_token is not None
     )
-    raw_content = response.choices[0].message.content
+    if on_token is None:
+        raw_content = response.choices[0].message.content
+    else:
+        parts = []
+        for chunk in response:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                parts.append(token)
+                on_token(token)
+        raw_content = "".join(parts)
     yaml_content = extract_format_content(raw_content,format)
     return yaml_content
 
+async def acall_openai(system_prompt: str, user_prompt: str,format :str, on_token: Optional[Callable[[str], None]] = None) -> str:
+
+    response = await get_async_openai_client().chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        stream=on_token is not None
+    )
+    if on_token is None:
+        raw_content = response.choices[0].message.content
+    else:
+        parts = []
+        async for chunk in response:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                parts.append(token)
+                on_token(token)
+        raw_content = "".join(parts)
+    return extract_format_content(raw_content,format)
+
 # --- GEMINI AI LLM Helpers ---
 
-def call_gemini(system_prompt: str, user_prompt: str,format :str) -> str:
+def call_gemini(system_prompt: str, user_prompt: str,format :str, on_token: Optional[Callable[[str], None]] = None) -> str:
    
     full_prompt = f"{system_prompt.strip()}\n\n{user_prompt.strip()}"
 
     print(full_prompt)
 
-    model = genai.GenerativeModel("gemini-1.5-flash")
+    if on_token is None:
+        response = get_gemini_model().generate_content(full_prompt)
+        return extract_format_content(response.text,format)
+
+    parts = []
+    for chunk in get_gemini_model().generate_content(full_prompt, stream=True):
+        parts.append(chunk.text)
+        on_token(chunk.text)
+    return extract_format_content("".join(parts),format)
+
+async def acall_gemini(system_prompt: str, user_prompt: str,format :str, on_token: Optional[Callable[[str], None]] = None) -> str:
+
+    full_prompt = f"{system_prompt.strip()}\n\n{user_prompt.strip()}"
+
+    if on_token is None:
+        response = await get_gemini_model().generate_content_async(full_prompt)
+        return extract_format_content(response.text,format)
 
-    response = model.generate_content(full_prompt)
-    return extract_format_content(response.text,format)
+    parts = []
+    async for chunk in await get_gemini_model().generate_content_async(full_prompt, stream=True):
+        parts.append(chunk.text)
+        on_token(chunk.text)
+    return extract_format_content("".join(parts),format)
 
 # --- LLM Helpers ---
-def call_ai_model(system_prompt: str, user_prompt: str,format: str) -> str:
+def llm_cache_key(system_prompt: str, user_prompt: str,format: str) -> str:
+    if model == "GEMINI":
+        return cache_key("GEMINI", GEMINI_MODEL, system_prompt, user_prompt, format)
+    return cache_key("OPENAI", OPENAI_MODEL, system_prompt, user_prompt, format)
+
+def call_ai_model(system_prompt: str, user_prompt: str,format: str, use_cache: bool = True, on_token: Optional[Callable[[str], None]] = None) -> str:
+    """on_token, when given, receives the completion text as it streams in"""
+
+    key = llm_cache_key(system_prompt, user_prompt, format)
+    if use_cache and (cached := get_llm_cache().get(key)) is not None:
+        if on_token:
+            on_token(cached)
+        return cached
 
     if model == "GEMINI":
-        return call_gemini(system_prompt,user_prompt,format)
+        result = call_gemini(system_prompt,user_prompt,format,on_token)
     else:
-        return call_openai(system_prompt,user_prompt,format)
+        result = call_openai(system_prompt,user_prompt,format,on_token)
+    if use_cache:
+        get_llm_cache().put(key, result)
+    return result
+
+async def acall_ai_model(system_prompt: str, user_prompt: str,format: str, use_cache: bool = True, on_token: Optional[Callable[[str], None]] = None) -> str:
+
+    key = llm_cache_key(system_prompt, user_prompt, format)
+    if use_cache and (cached := await get_llm_cache().aget(key)) is not None:
+        if on_token:
+            on_token(cached)
+        return cached
+
+    if model == "GEMINI":
+        result = await acall_gemini(system_prompt,user_prompt,format,on_token)
+    else:
+        result = await acall_openai(system_prompt,user_prompt,format,on_token)
+    if use_cache:
+        await get_llm_cache().aput(key, result)
+    return result
 
 
 def build_user_prompt(state: dict) -> str:
@@ -216,112 +375,112 @@ def build_user_prompt(state: dict) -> str:
 
 def create_on_boarding_branch(state: QAState) -> QAState:
     base_branch = state.get("base_branch")
-    create_on_boarding_branch_if_not_exists(state,base_branch)
+    branch_name = create_on_boarding_branch_if_not_exists(state,base_branch)
+    # all files are read at this commit, so the atomic commit can tell whether the branch moved under them
+    try:
+        state["base_sha"] = get_content_cache().resolve_sha(branch_name)
+    except Exception as e:
+        # without it the commit could not tell whether the files changed on the branch after they were read
+        print(f"Error resolving {branch_name}: {e}")
+        stream_message_to_ui(f"Failed to resolve the head of {branch_name} branch, no changes will be committed: {e}")
+        state["base_sha"] = ""
+        state["abort"] = True
     return state 
 
 def fetch_sor_codes(state: QAState) -> QAState:
-    branch_name = state.get("branch_name")
+    branch_name = state.get("base_sha") or state.get("branch_name")
     sor_codes_content = fetch_content(branch_name,sor_code_file)
     if not sor_codes_content:
         print(f"Failed to fetch {sor_code_file}")
         stream_message_to_ui(f"Failed to fetch {sor_code_file}")
-        state["abort"] = True
-    else:
-        state["sor_codes_content"] = sor_codes_content
-    return state
+        return {"abort": True}
+    return {"sor_codes_content": sor_codes_content}
 
-def call_llm_for_sor_codes(state: QAState) -> QAState:
+def can_merge(state: QAState, content_key: str) -> bool:
+    # merging into the empty content of a failed fetch would replace the whole file with the new entries only
+    if state.get("abort") or not state.get(content_key):
+        print(f"Skipping merge, {content_key} was not fetched")
+        return False
+    return True
 
-    system_prompt = f"""
-        You are an expert onboarding assistant. You are provided with a Acct,Deal SOR configurations.
-        You must:
-        - extract only the SOR from given input format ACCT/SOR_CODE,DEAL/SOR_CODE check case in-sensitive
-        - Check whether a given SOR is present in Acct or DEAL respectively.
-        - If not present, update it in the respective section
-        - Do not add any new sections from INPUT DATA
-        - Maintain the structure and return the updated YAML.
-         
-        \n\n{state["sor_codes_content"]}
-    """
-    user_prompt = build_user_prompt(state)
-    updated_sor_codes = call_ai_model(system_prompt, user_prompt,"yaml")
-    print(f"updated_sor_codes YAML.")
-    stream_message_to_ui(f"updated sor_codes from AI Model.")
-    state["updated_sor_codes"] = updated_sor_codes
-    return state
+def merge_sor_codes_node(state: QAState) -> QAState:
+    if not can_merge(state, "sor_codes_content"):
+        return {}
+    # Adding SOR codes is a set union, so it is done structurally instead of asking the LLM for the whole file
+    sor_codes = get_answer(state["questions"], state["answers"], "SOR Codes")
+    try:
+        updated_sor_codes, added, skipped = merge_sor_codes(state.get("sor_codes_content", ""), sor_codes)
+    except Exception as e:
+        print(f"Error merging sor_codes: {e}")
+        stream_message_to_ui(f"SOR codes merge failed: {e}")
+        return {"abort": True}
+    for section, codes in skipped.items():
+        print(f"skipped sor_codes {section}: {', '.join(codes)}, no {section} section in {sor_code_file}")
+        stream_message_to_ui(f"skipped sor_codes {section}: {', '.join(codes)}, {sor_code_file} has no {section} section")
+    if not added:
+        if not skipped:
+            print("sor_codes already up to date.")
+            stream_message_to_ui("sor_codes already up to date.")
+        return {}
+    added_text = ", ".join(f"{section}: {', '.join(codes)}" for section, codes in added.items())
+    print(f"merged sor_codes {added_text}")
+    stream_message_to_ui(f"added sor_codes {added_text}")
+    return {"updated_sor_codes": updated_sor_codes, "change_notes": {sor_code_file: f"added SOR codes {added_text}"}}
+
+def stage_file(file_path: str, updated_content: str) -> QAState:
+    if not updated_content:
+        print(f"No updated content for {file_path}, skipping")
+        return {}
+    return {"pending_files": {file_path: updated_content}}
 
 def update_sor_codes_file_node(state: QAState) -> QAState:
-    branch_name = state.get("branch_name")
-    update_or_create_file(state["updated_sor_codes"], branch_name,sor_code_file,state["jira_no"])
-    return state
+    return stage_file(sor_code_file, state.get("updated_sor_codes"))
 
 def fetch_rules(state: QAState) -> QAState:
-    branch_name = state.get("branch_name")
+    branch_name = state.get("base_sha") or state.get("branch_name")
     rules_content = fetch_content(branch_name,rule_file)
     if not rules_content:
         print(f"Failed to fetch {rule_file}")
         stream_message_to_ui(f"Failed to fetch {rule_file}")
-        state["abort"] = True
-    else:
-        state["rules_content"] = rules_content
-    return state
-
-def call_llm_for_rules(state: QAState) -> QAState:
-
-    system_prompt = f"""
-        You are an expert onboarding assistant. You are provided with a YAML configuration that contains rules configuration based on below rule types
-
-        Partions Info:
-            P0 is Federated
-            P1 to P4 are non Regulated
-            P5 is Regulated
-
-        Rule Types Description :
-            non_regulated_rccRule (when Partition is non Regulated and #COUNTRY|LOB|TYPE|DOC_CAT|DOC_TYPE have data from "RCC RULES" INPUT DATA),
-            inv_ref_id_rccRule (when Partition is Regulated and #COUNTRY|INV_REF have data from "RCC RULES" INPUT DATA),
-            non_regulated_inv_ref_id_rccRule  (when Partition is non Regulated and #COUNTRY|INV_REF have data from "RCC RULES" from INPUT DATA)
- 
-        
-        You must:
-        - Consider the data only from "RCC RULES" from INPUT DATA
-        - Check whether a given key input for that section is already present if yes dont do any action
-        - If not present, update it in the respective section which are more matched with columns based on "RCC RULES" INPUT DATA provided
-        - if value is not present for any column in above matched keep '' instead of null
-        - Do not add any new sections from INPUT DATA
-        - key for each section should not contain duplicate
-        - Maintain the structure and return the updated YAML.
-        
-        \n\n{state["rules_content"]}
-    """
-    user_prompt = build_user_prompt(state)
-    updated_rules = call_ai_model(system_prompt, user_prompt,"yaml")
-    print(" updated_rules YAML.")
-    stream_message_to_ui(" updated rules YAML from AI Model.")
-    state["updated_rules"] = updated_rules
-    return state
+        return {"abort": True}
+    return {"rules_content": rules_content}
+
+def merge_rules_node(state: QAState) -> QAState:
+    if not can_merge(state, "rules_content"):
+        return {}
+    # New RCC keys are written straight into their rule type map, existing rules are never regenerated
+    updated_rules, added, skipped = merge_rules(state.get("rules_content", ""), state["questions"], state["answers"])
+    for line in skipped:
+        print(f"skipped rules line {line['lineNumber']} '{line['rule']}': {line['reason']}")
+        stream_message_to_ui(f"skipped RCC RULES line {line['lineNumber']} '{line['rule']}', {line['reason']}")
+    if not added:
+        if not skipped:
+            print("rules already up to date.")
+            stream_message_to_ui("rules already up to date.")
+        return {}
+    added_text = ", ".join(f"{rule_type}: {', '.join(keys)}" for rule_type, keys in added.items())
+    print(f"merged rules {added_text}")
+    stream_message_to_ui(f"added rules {added_text}")
+    return {"updated_rules": updated_rules, "change_notes": {rule_file: f"added RCC rules {added_text}"}}
 
 def update_rules_file_node(state: QAState) -> QAState: 
-    branch_name = state.get("branch_name")
-    update_or_create_file(state["updated_rules"], branch_name,rule_file,state["jira_no"])
-    return state
+    return stage_file(rule_file, state.get("updated_rules"))
 
 # 
 
 
 def fetch_bu_on_boarding(state: QAState) -> QAState:
-    branch_name = state.get("branch_name")
+    branch_name = state.get("base_sha") or state.get("branch_name")
     bu_on_boarding_content = fetch_content(branch_name,bu_on_boarding_file)
     if not bu_on_boarding_content:
         print(f"Failed to fetch {bu_on_boarding_file}")
         stream_message_to_ui(f"Failed to fetch {bu_on_boarding_file}")
-        state["abort"] = True
-    else:
-        state["bu_on_boarding_content"] = bu_on_boarding_content
-    return state
+        return {"abort": True}
+    return {"bu_on_boarding_content": bu_on_boarding_content}
 
-def call_llm_for_bu_on_boarding(state: QAState) -> QAState:
+def bu_on_boarding_system_prompt(state: QAState) -> str:
 
-    system_prompt = f"""
+    return f"""
        You are an expert onboarding assistant. You are provided with a YAML configuration that contains onboarding configuration
 
         ------------------------------------------------------
@@ -359,19 +518,84 @@ def call_llm_for_bu_on_boarding(state: QAState) -> QAState:
 
         \n\n{state["bu_on_boarding_content"]}
     """
+
+def bu_on_boarding_change_note(state: QAState, action: str, source: str = "") -> str:
+    bus_unit = get_answer(state["questions"], state["answers"], "BUS UNIT").strip()
+    return f"{action} bus unit {bus_unit}" + (f" (generated by the {source})" if source else "")
+
+def call_llm_for_bu_on_boarding(state: QAState) -> QAState:
     user_prompt = build_user_prompt(state)
-    updated_bu_on_boarding = call_ai_model(system_prompt, user_prompt,"yaml")
+    streamer = UIChunkStreamer(bu_on_boarding_file)
+    updated_bu_on_boarding = call_ai_model(bu_on_boarding_system_prompt(state), user_prompt,"yaml",on_token=streamer)
+    streamer.flush()
     print(" updated bu_on_boarding YAML.")
     stream_message_to_ui(" updated BU ON BOARDING YAML from AI Model.")
-    state["updated_bu_on_boarding"] = updated_bu_on_boarding
-    return state
+    return {"updated_bu_on_boarding": updated_bu_on_boarding, "change_notes": {bu_on_boarding_file: bu_on_boarding_change_note(state, "updated", "AI Model")}}
+
+async def acall_llm_for_bu_on_boarding(state: QAState) -> QAState:
+    user_prompt = build_user_prompt(state)
+    streamer = UIChunkStreamer(bu_on_boarding_file)
+    updated_bu_on_boarding = await acall_ai_model(bu_on_boarding_system_prompt(state), user_prompt,"yaml",on_token=streamer)
+    streamer.flush()
+    print(" updated bu_on_boarding YAML.")
+    stream_message_to_ui(" updated BU ON BOARDING YAML from AI Model.")
+    return {"updated_bu_on_boarding": updated_bu_on_boarding, "change_notes": {bu_on_boarding_file: bu_on_boarding_change_note(state, "updated", "AI Model")}}
+
+def try_merge_bu_on_boarding(state: QAState) -> Optional[QAState]:
+    """Returns the state update of the deterministic merge (abort when it failed), or None when the LLM fallback should run"""
+    try:
+        updated_bu_on_boarding, action = merge_bu_on_boarding(state.get("bu_on_boarding_content", ""), state["questions"], state["answers"])
+    except Exception as e:
+        print(f"Error merging bu_on_boarding: {e}")
+        if bu_on_boarding_llm_fallback:
+            stream_message_to_ui("BU ON BOARDING merge failed, falling back to AI Model.")
+            return None
+        # committing the SOR codes and rules without the BU entry would leave the on-boarding half done
+        stream_message_to_ui(f"BU ON BOARDING merge failed: {e}")
+        return {"abort": True}
+    print(f"{action} bu_on_boarding YAML.")
+    stream_message_to_ui(f"{action} BU ON BOARDING YAML.")
+    return {"updated_bu_on_boarding": updated_bu_on_boarding, "change_notes": {bu_on_boarding_file: bu_on_boarding_change_note(state, action)}}
+
+def merge_bu_on_boarding_node(state: QAState) -> QAState:
+    if not can_merge(state, "bu_on_boarding_content"):
+        return {}
+    result = try_merge_bu_on_boarding(state)
+    return call_llm_for_bu_on_boarding(state) if result is None else result
+
+async def amerge_bu_on_boarding_node(state: QAState) -> QAState:
+    if not can_merge(state, "bu_on_boarding_content"):
+        return {}
+    result = try_merge_bu_on_boarding(state)
+    return await acall_llm_for_bu_on_boarding(state) if result is None else result
 
 def update_bu_on_boarding_node(state: QAState) -> QAState: 
-    branch_name = state.get("branch_name")
-    update_or_create_file(state["updated_bu_on_boarding"], branch_name,bu_on_boarding_file,state["jira_no"])
-    return state
+    return stage_file(bu_on_boarding_file, state.get("updated_bu_on_boarding"))
 # 
 
+def commit_files_node(state: QAState) -> QAState:
+    pending_files = state.get("pending_files") or {}
+    if state.get("abort"):
+        # a fetch failed, committing the other files would leave the branch half updated
+        print(f"Submit aborted, not committing {', '.join(pending_files) or 'any files'}")
+        stream_message_to_ui(f"Submit aborted, no changes were committed to {state.get('branch_name')} branch")
+        return {}
+    if not pending_files:
+        print(f"Nothing to commit in branch {state.get('branch_name')}")
+        stream_message_to_ui(f"No changes needed, {state.get('branch_name')} branch is already up to date")
+        return {}
+    try:
+        commit_files(pending_files, state.get("branch_name"), state.get("jira_no"), state.get("base_sha"), state.get("change_notes"))
+    except Exception as e:
+        print(f"Error committing {', '.join(pending_files)}: {e}")
+        stream_message_to_ui(f"Failed to update {', '.join(pending_files)} in {state.get('branch_name')} branch: {e}")
+        return {"abort": True}
+    return {}
+
+def route_after_commit(state: QAState) -> str:
+    # no PR, config refresh or test run for a branch without the changes, GitHub also rejects a PR without commits
+    return "end" if state.get("abort") or not state.get("pending_files") else "create_pr"
+
 def create_pr_node(state: QAState) -> QAState:
     branch_name = state.get("branch_name")
     base_branch = state.get("base_branch")
@@ -476,62 +700,100 @@ def call_api_to_trigger_test_cases(state: QAState) -> QAState:
 
 # --- LangGraph Flow ---
 
+def build_submit_on_boarding_graph():
+    # LangGraph is imported here rather than at module level, it takes about a second to import
+    from langgraph.graph import StateGraph, START, END
+    from langchain_core.runnables import RunnableLambda
+
+    graph = StateGraph(QAState)
+
 
-graph = StateGraph(QAState)
+    # Submit split nodes
+    graph.add_node("create_base_branch", create_base_branch)
+    graph.add_node("create_on_boarding_branch", create_on_boarding_branch)
 
+    graph.add_node("fetch_sor_codes", fetch_sor_codes)
+    graph.add_node("merge_sor_codes", merge_sor_codes_node)
+    graph.add_node("update_sor_codes_file", update_sor_codes_file_node)
 
-# Submit split nodes
-graph.add_node("create_base_branch", create_base_branch)
-graph.add_node("create_on_boarding_branch", create_on_boarding_branch)
+    graph.add_node("fetch_rules", fetch_rules)
+    graph.add_node("merge_rules", merge_rules_node)
+    graph.add_node("update_rules_file", update_rules_file_node)
 
-graph.add_node("fetch_sor_codes", fetch_sor_codes)
-graph.add_node("call_llm_for_sor_codes", call_llm_for_sor_codes)
-graph.add_node("update_sor_codes_file", update_sor_codes_file_node)
+    graph.add_node("fetch_bu_on_boarding", fetch_bu_on_boarding)
+    # runs the async variant under ainvoke so a fallback LLM call does not hold a worker thread
+    graph.add_node("merge_bu_on_boarding", RunnableLambda(merge_bu_on_boarding_node, afunc=amerge_bu_on_boarding_node))
+    graph.add_node("update_bu_on_boarding_file", update_bu_on_boarding_node)
 
-graph.add_node("fetch_rules", fetch_rules)
-graph.add_node("call_llm_for_rules", call_llm_for_rules)
-graph.add_node("update_rules_file", update_rules_file_node)
+    graph.add_node("commit_files", commit_files_node)
+    graph.add_node("create_pr", create_pr_node)
 
-graph.add_node("fetch_bu_on_boarding", fetch_bu_on_boarding)
-graph.add_node("call_llm_for_bu_on_boarding", call_llm_for_bu_on_boarding)
-graph.add_node("update_bu_on_boarding_file", update_bu_on_boarding_node)
+    graph.add_node("call_api_to_update_config", call_api_to_update_config)
 
-graph.add_node("create_pr", create_pr_node)
+    graph.add_node("call_api_to_trigger_test_cases", call_api_to_trigger_test_cases)
 
-graph.add_node("call_api_to_update_config", call_api_to_update_config)
+    graph.add_edge(START, "create_base_branch")
 
-graph.add_node("call_api_to_trigger_test_cases", call_api_to_trigger_test_cases)
 
-graph.add_edge(START, "create_base_branch")
+    # Submit Chain
 
+    graph.add_edge("create_base_branch", "create_on_boarding_branch")
 
-# Submit Chain
+    # SOR codes, rules and BU on-boarding touch independent files, so they run as
+    # parallel branches and only join again before the PR is raised
+    graph.add_edge("create_on_boarding_branch", "fetch_sor_codes")
+    graph.add_edge("fetch_sor_codes", "merge_sor_codes")
+    graph.add_edge("merge_sor_codes", "update_sor_codes_file")
 
-graph.add_edge("create_base_branch", "create_on_boarding_branch")
+    graph.add_edge("create_on_boarding_branch", "fetch_rules")
+    graph.add_edge("fetch_rules", "merge_rules")
+    graph.add_edge("merge_rules", "update_rules_file")
 
-graph.add_edge("create_on_boarding_branch", "fetch_sor_codes")
-graph.add_edge("fetch_sor_codes", "call_llm_for_sor_codes")
-graph.add_edge("call_llm_for_sor_codes", "update_sor_codes_file")
+    graph.add_edge("create_on_boarding_branch", "fetch_bu_on_boarding")
+    graph.add_edge("fetch_bu_on_boarding", "merge_bu_on_boarding")
+    graph.add_edge("merge_bu_on_boarding", "update_bu_on_boarding_file")
 
-graph.add_edge("update_sor_codes_file", "fetch_rules")
-graph.add_edge("fetch_rules", "call_llm_for_rules")
-graph.add_edge("call_llm_for_rules", "update_rules_file")
+    # enable this without LLM call just to test flow
+    # graph.add_edge("create_on_boarding_branch", "fetch_rules")
+    # graph.add_edge("fetch_rules", "update_rules_file")
+    # enable this without LLM call just to test flow
 
-graph.add_edge("update_rules_file", "fetch_bu_on_boarding")
-graph.add_edge("fetch_bu_on_boarding", "call_llm_for_bu_on_boarding")
-graph.add_edge("call_llm_for_bu_on_boarding", "update_bu_on_boarding_file")
+    graph.add_edge(["update_sor_codes_file", "update_rules_file", "update_bu_on_boarding_file"], "commit_files")
+    graph.add_conditional_edges("commit_files", route_after_commit, {"create_pr": "create_pr", "end": END})
+    graph.add_edge("create_pr", "call_api_to_update_config")
+    graph.add_edge("call_api_to_update_config", "call_api_to_trigger_test_cases")
 
-# enable this without LLM call just to test flow
-# graph.add_edge("create_on_boarding_branch", "fetch_rules")
-# graph.add_edge("fetch_rules", "update_rules_file")
-# enable this without LLM call just to test flow
+    graph.add_edge("call_api_to_trigger_test_cases", END)
 
-graph.add_edge("update_bu_on_boarding_file", "create_pr")
-graph.add_edge("create_pr", "call_api_to_update_config")
-graph.add_edge("call_api_to_update_config", "call_api_to_trigger_test_cases")
+    return graph
 
-graph.add_edge("call_api_to_trigger_test_cases", END)
+SUBMIT_ON_BOARDING_GRAPH = "submit_on_boarding_service"
+# compiled once and shared by every request
+graph_registry.register(SUBMIT_ON_BOARDING_GRAPH, build_submit_on_boarding_graph)
 
-def run_langgraph(state: QAState):
-    compiled_graph = graph.compile()
-    return compiled_graph.invoke(state)
\ No newline at end of file
+def __getattr__(name: str):
+    # langgraph.json loads submit_on_boarding_service.py:graph, it is built only when asked for
+    if name == "graph":
+        return build_submit_on_boarding_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def submit_on_boarding_node_count() -> int:
+    return len([node for node in graph_registry.get(SUBMIT_ON_BOARDING_GRAPH).nodes if not node.startswith("__")])
+
+async def arun_langgraph(state: QAState, workflow_id: Optional[str] = None, on_node: Optional[Callable[[str], None]] = None):
+    """on_node, when given, is called with the name of every node as it completes"""
+    token = current_workflow_id.set(workflow_id)
+    try:
+        if on_node is None:
+            return await graph_registry.ainvoke(SUBMIT_ON_BOARDING_GRAPH, state)
+        final_state = state
+        async for mode, chunk in graph_registry.astream(SUBMIT_ON_BOARDING_GRAPH, state, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state = chunk
+                continue
+            for node in chunk:
+                if not node.startswith("__"):
+                    on_node(node)
+        return final_state
+    finally:
+        current_workflow_id.reset(token)
\ No newline at end of file
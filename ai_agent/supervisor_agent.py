@@ -1,25 +1,26 @@
 from typing import Dict, List, Any, TypedDict, Annotated, Literal, Optional
-from langgraph.graph import StateGraph, END
-from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.constants import END
 import operator
 from dotenv import load_dotenv
 import os
-import google.generativeai as genai
 import asyncio
 import json
 import uuid
-from doc_classification_agent import doc_classification_agent, doc_classification_agent_sync
+from doc_classification_agent import doc_classification_agent
 from rcc_classification_agent import rcc_classification_agent
-from submit_on_boarding_service import run_langgraph, QAState
+from submit_on_boarding_service import arun_langgraph, QAState
+from graph_registry import graph_registry
+from upload_stream import without_file
+from state_store import StateStore, create_store
+from questionnaire import QUESTION_TEXTS
 
 # Load environment variables
 load_dotenv()
 
-# Set up Gemini API
-GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+def add_messages(left: List, right: List) -> List:
+    # LangGraph's add_messages reducer, imported on first use to keep LangGraph out of module import
+    from langgraph.graph.message import add_messages as merge_messages
+    return merge_messages(left, right)
 
 # Define the state structure
 class SupervisorState(TypedDict):
@@ -34,6 +35,10 @@ class SupervisorState(TypedDict):
     context: Dict[str, Any]
     next_action: str
 
+# Open upload files of the workflows running step 1, by workflow id. Kept out of the state since the state is
+# checkpointed and stored until the user proceeds, the state only holds file metadata and content hashes.
+upload_files: Dict[str, List[Any]] = {}
+
 # Initialize the state
 def create_initial_state(uploaded_files: List[Dict], workflow_id: str) -> SupervisorState:
     return {
@@ -50,14 +55,15 @@ def create_initial_state(uploaded_files: List[Dict], workflow_id: str) -> Superv
     }
 
 # Document Classification Agent: API Service Agent
-def doc_classification_agent_node(state: SupervisorState) -> SupervisorState:
+async def doc_classification_agent_node(state: SupervisorState) -> SupervisorState:
     """Document Classification Agent: Calls external API service to classify uploaded documents"""
     
     try:
-        uploaded_files = state["uploaded_files"]
+        files = upload_files.get(state["workflow_id"], [])
+        uploaded_files = [{**file_info, "file": file} for file_info, file in zip(state["uploaded_files"], files)]
         
-        # Use the synchronous wrapper that handles async calls safely
-        doc_classification_result = doc_classification_agent_sync(uploaded_files)
+        # Runs on the server event loop, the API calls share its pooled session
+        doc_classification_result = await doc_classification_agent(uploaded_files)
         
         state["docClassificationAgent_result"] = doc_classification_result
         state["current_step"] = "rccClassificationAgent"
@@ -100,7 +106,7 @@ def rcc_classification_agent_node(state: SupervisorState) -> SupervisorState:
     return state
 
 # Submit Onboarding Agent: Onboarding Service Agent
-def submit_onboarding_agent_node(state: SupervisorState) -> SupervisorState:
+async def submit_onboarding_agent_node(state: SupervisorState) -> SupervisorState:
     """Submit Onboarding Agent: Run submit_on_boarding_service with processed data"""
     
     docClassificationAgent_result = state["docClassificationAgent_result"]
@@ -115,16 +121,7 @@ def submit_onboarding_agent_node(state: SupervisorState) -> SupervisorState:
         qa_data = state.get("context", {}).get("qa_input")
         
         # Create QAState for the onboarding service
-        questions = [
-            "Enter On Boarding Name",
-            "Enter Partition ? (P0, P1, P2, P3, P4, P5)",
-            "Enter Eligible SOR Codes ? (Example: ACCT/SOR,DEAL/SOR)",
-            "Enter BUS UNIT",
-            "Enter RCC RULES",
-            "Enter Sampling Rule Ref",
-            'Enter Sampling Id',
-            'Enter Sampling Data'
-        ]
+        questions = QUESTION_TEXTS
         
         # Use QAInput data if available, otherwise extract from other sources
         if qa_data:
@@ -147,6 +144,7 @@ def submit_onboarding_agent_node(state: SupervisorState) -> SupervisorState:
             "command": "",
             "base_branch": extracted_data.get("base_branch", "main"),
             "branch_name": extracted_data.get("branch_name", f"onboarding-{state['workflow_id']}"),
+            "base_sha": "",
             "jira_no": extracted_data.get("jira_no", ""),
             "sor_codes_content": "",
             "updated_sor_codes": "",
@@ -159,7 +157,9 @@ def submit_onboarding_agent_node(state: SupervisorState) -> SupervisorState:
         }
         
         # Run the onboarding service
-        onboarding_result = run_langgraph(qa_state)
+        onboarding_result = await arun_langgraph(qa_state, state["workflow_id"])
+        if onboarding_result.get("abort"):
+            raise RuntimeError("Submit on-boarding aborted, no changes were committed")
         
         # Store the result
         state["onboardingAgent_result"] = {
@@ -295,7 +295,8 @@ def route_workflow(state: SupervisorState) -> Literal["docClassificationAgent",
     elif next_action == "wait_for_ui":
         return "wait_for_ui"
     elif next_action == "end":
-        return END
+        # the conditional edge path maps are keyed by "end"
+        return "end"
     else:
         return "wait_for_ui"
 
@@ -309,9 +310,13 @@ def wait_for_ui(state: SupervisorState) -> SupervisorState:
     state["current_step"] = "wait_for_ui"
     return state
 
-# Create the LangGraph workflow
-def create_supervisor_workflow():
-    """Create the supervisor workflow using LangGraph"""
+SUPERVISOR_GRAPH = "supervisor_workflow"
+ONBOARDING_GRAPH = "supervisor_onboarding"
+
+# Build the LangGraph workflow
+def build_supervisor_workflow():
+    """Build the supervisor workflow using LangGraph"""
+    from langgraph.graph import StateGraph
     
     # Create the graph
     workflow = StateGraph(SupervisorState)
@@ -363,29 +368,45 @@ def create_supervisor_workflow():
     # Set entry point
     workflow.set_entry_point("docClassificationAgent")
     
-    # Compile the graph
-    app = workflow.compile(checkpointer=MemorySaver())
-    
-    return app
+    return workflow
+
+def build_onboarding_workflow():
+    """Graph starting from submit onboarding agent, run after UI confirmation"""
+    from langgraph.graph import StateGraph
+    workflow = StateGraph(SupervisorState)
+    workflow.add_node("onboardingAgent", submit_onboarding_agent_node)
+    workflow.add_edge("onboardingAgent", END)
+    workflow.set_entry_point("onboardingAgent")
+    return workflow
+
+# Both graphs are compiled once and checkpoint into the registry's shared checkpointer
+graph_registry.register(SUPERVISOR_GRAPH, build_supervisor_workflow, checkpoint=True)
+graph_registry.register(ONBOARDING_GRAPH, build_onboarding_workflow, checkpoint=True)
+
+def create_supervisor_workflow():
+    """Return the compiled supervisor workflow"""
+    return graph_registry.get(SUPERVISOR_GRAPH)
+
+def onboarding_thread_id(workflow_id: str) -> str:
+    # step 3 runs a different graph, so it checkpoints into its own thread
+    return f"{workflow_id}:onboarding"
 
 # Workflow management functions
 
 
-def run_workflow_step1_sync(uploaded_files: List[Dict], workflow_id: str) -> Dict[str, Any]:
+async def run_workflow_step1(uploaded_files: List[Dict], workflow_id: str) -> Dict[str, Any]:
     """Run workflow steps 1 and 2 (Agent 1 -> Agent 2) using LangGraph"""
     
     try:
-        # Create initial state
-        state = create_initial_state(uploaded_files, workflow_id)
-        
-        # Create and run the workflow
-        app = create_supervisor_workflow()
+        # Create initial state, the open files are handed to the DocClassificationAgent outside of it
+        upload_files[workflow_id] = [file_info.get("file") for file_info in uploaded_files]
+        state = create_initial_state([without_file(file_info) for file_info in uploaded_files], workflow_id)
         
         # Run the workflow up to wait_for_ui
         config = {"configurable": {"thread_id": workflow_id}}
         
         # Run the workflow
-        result = app.invoke(state, config=config)
+        result = await graph_registry.ainvoke(SUPERVISOR_GRAPH, state, config=config)
         
         # Ensure we have the required fields in the result
         if "docClassificationAgent_result" not in result:
@@ -400,6 +421,7 @@ def run_workflow_step1_sync(uploaded_files: List[Dict], workflow_id: str) -> Dic
             "current_step": result["current_step"],
             "docClassificationAgent_result": result["docClassificationAgent_result"],
             "rccClassificationAgent_result": result["rccClassificationAgent_result"],
+            "uploaded_files": state["uploaded_files"],
             "status": "waiting_for_ui_confirmation",
             "thread_id": workflow_id
         }
@@ -414,13 +436,12 @@ def run_workflow_step1_sync(uploaded_files: List[Dict], workflow_id: str) -> Dic
             "error": str(e),
             "thread_id": workflow_id
         }
+    finally:
+        upload_files.pop(workflow_id, None)
 
-def run_workflow_step2(workflow_id: str, ui_response: str, previous_state: Dict[str, Any], qa_data: Optional[Dict] = None) -> Dict[str, Any]:
+async def run_workflow_step2(workflow_id: str, ui_response: str, previous_state: Dict[str, Any], qa_data: Optional[Dict] = None) -> Dict[str, Any]:
     """Run workflow step 3 (Submit Onboarding Agent) after UI confirmation using LangGraph"""
     
-    # Create the workflow app
-    app = create_supervisor_workflow()
-    
     # Update the state with UI response and QAInput data
     state = {
         "messages": [],
@@ -436,16 +457,8 @@ def run_workflow_step2(workflow_id: str, ui_response: str, previous_state: Dict[
     }
     
     # Run the workflow from submit onboarding agent
-    config = {"configurable": {"thread_id": workflow_id}}
-    
-    # Create a new graph starting from submit onboarding agent
-    workflow = StateGraph(SupervisorState)
-    workflow.add_node("onboardingAgent", submit_onboarding_agent_node)
-    workflow.add_edge("onboardingAgent", END)
-    workflow.set_entry_point("onboardingAgent")
-    
-    final_app = workflow.compile(checkpointer=MemorySaver())
-    result = final_app.invoke(state, config=config)
+    config = {"configurable": {"thread_id": onboarding_thread_id(workflow_id)}}
+    result = await graph_registry.ainvoke(ONBOARDING_GRAPH, state, config=config)
     
     # Check if submit onboarding service completed successfully
     onboardingAgent_result = result["onboardingAgent_result"]
@@ -471,40 +484,38 @@ def run_workflow_step2(workflow_id: str, ui_response: str, previous_state: Dict[
         "jira_no": onboardingAgent_result.get("jira_no", "")
     }
 
-# In-memory storage for workflow states (for API endpoints)
-workflow_states = {}
+def release_workflow_threads(workflow_id: str):
+    """Drop the LangGraph checkpoints of a workflow"""
+    graph_registry.delete_thread(workflow_id)
+    graph_registry.delete_thread(onboarding_thread_id(workflow_id))
+
+# Workflow states between step 1 and step 2 (for API endpoints), abandoned workflows expire with their checkpoints
+workflow_states: StateStore[Dict[str, Any]] = create_store(
+    "workflow_states",
+    ttl_seconds=float(os.getenv("WORKFLOW_STATE_TTL_SECONDS", 24 * 60 * 60)),
+    on_expire=release_workflow_threads
+)
 
 def store_workflow_state(workflow_id: str, state: Dict[str, Any]):
-    """Store workflow state in memory"""
-    workflow_states[workflow_id] = state
+    """Store workflow state in the state store"""
+    workflow_states.put(workflow_id, state)
 
 def get_workflow_state(workflow_id: str) -> Dict[str, Any]:
-    """Get workflow state from memory"""
-    return workflow_states.get(workflow_id, {})
+    """Get workflow state from the state store"""
+    return workflow_states.get(workflow_id) or {}
 
 def delete_workflow_state(workflow_id: str):
-    """Delete workflow state from memory"""
-    if workflow_id in workflow_states:
-        del workflow_states[workflow_id]
+    """Delete workflow state and its LangGraph checkpoints"""
+    workflow_states.delete(workflow_id)
+    release_workflow_threads(workflow_id)
 
-# Function to get workflow status from LangGraph checkpoint
-def get_workflow_status_from_langgraph(thread_id: str) -> Dict[str, Any]:
-    """Get workflow status from LangGraph checkpoint"""
-    try:
-        app = create_supervisor_workflow()
-        config = {"configurable": {"thread_id": thread_id}}
-        
-        # Get the current state from the checkpoint
-        # Note: This is a simplified approach. In a real implementation,
-        # you would use LangGraph's checkpoint retrieval methods
-        return {
-            "thread_id": thread_id,
-            "status": "active",
-            "message": "Workflow is active in LangGraph"
-        }
-    except Exception as e:
-        return {
-            "thread_id": thread_id,
-            "status": "error",
-            "error": str(e)
-        } 
\ No newline at end of file
+# Async variants for the endpoints, the state store may be backed by SQLite
+async def astore_workflow_state(workflow_id: str, state: Dict[str, Any]):
+    await workflow_states.aput(workflow_id, state)
+
+async def aget_workflow_state(workflow_id: str) -> Dict[str, Any]:
+    return await workflow_states.aget(workflow_id) or {}
+
+async def adelete_workflow_state(workflow_id: str):
+    await workflow_states.adelete(workflow_id)
+    release_workflow_threads(workflow_id)
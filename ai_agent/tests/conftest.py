@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The agent modules import each other as top level modules (they run from the ai_agent directory)
+AI_AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AI_AGENT_DIR not in sys.path:
+    sys.path.insert(0, AI_AGENT_DIR)
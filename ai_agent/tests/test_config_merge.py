@@ -0,0 +1,176 @@
+import pytest
+from config_merge import merge_bu_on_boarding, merge_rules, merge_sor_codes, parse_sor_codes
+
+# --- SOR Codes Merge ---
+SOR_CODES = """# SOR codes eligible for on-boarding
+sorCodes:
+  Acct:
+    - ACC1   # first account SOR
+    - ACC2
+  DEAL:
+    - DL1
+"""
+
+def test_parse_sor_codes_groups_by_prefix():
+    assert parse_sor_codes("ACCT/A1, deal/D1,ACCT/A2,OTHER/X,ACCT/") == {"Acct": ["A1", "A2"], "DEAL": ["D1"]}
+
+def test_merge_sor_codes_appends_and_keeps_comments_and_order():
+    updated, added, skipped = merge_sor_codes(SOR_CODES, "ACCT/ACC3,DEAL/DL2")
+    assert added == {"Acct": ["ACC3"], "DEAL": ["DL2"]}
+    assert skipped == {}
+    assert updated == """# SOR codes eligible for on-boarding
+sorCodes:
+  Acct:
+    - ACC1   # first account SOR
+    - ACC2
+    - ACC3
+  DEAL:
+    - DL1
+    - DL2
+"""
+
+def test_merge_sor_codes_skips_existing_codes_case_insensitively():
+    updated, added, skipped = merge_sor_codes(SOR_CODES, "ACCT/acc1,DEAL/DL1")
+    assert added == {}
+    assert updated == SOR_CODES
+
+def test_merge_sor_codes_skips_codes_without_a_section():
+    updated, added, skipped = merge_sor_codes("sorCodes:\n  Acct:\n    - ACC1\n", "DEAL/DL1,DEAL/DL2")
+    assert added == {}
+    assert skipped == {"DEAL": ["DL1", "DL2"]}
+    assert "DEAL" not in updated
+    assert "DEAL" not in updated
+
+def test_merge_sor_codes_keeps_comma_separated_sections_a_string():
+    updated, added, _ = merge_sor_codes("sorCodes:\n  Acct: ACC1, ACC2\n  DEAL: 'DL1'\n", "ACCT/acc2,ACCT/ACC3,DEAL/DL2")
+    assert added == {"Acct": ["ACC3"], "DEAL": ["DL2"]}
+    assert updated == "sorCodes:\n  Acct: ACC1, ACC2, ACC3\n  DEAL: 'DL1,DL2'\n"
+
+def test_merge_sor_codes_rejects_a_mapping_section():
+    with pytest.raises(ValueError):
+        merge_sor_codes("sorCodes:\n  Acct:\n    code: ACC1\n", "ACCT/ACC3")
+
+# --- RCC Rules Merge ---
+QUESTIONS = ["Enter Partition ? (P0, P1, P2, P3, P4, P5)", "Enter RCC RULES"]
+
+RULES = """rules:
+  # keyed by [COUNTRY|LOB|TYPE|DOC_CAT|DOC_TYPE]
+  non_regulated_rccRule:
+    "[US|L1|T1|C1|D1]": R1
+  inv_ref_id_rccRule:
+    "[US|INV1]": R2
+  non_regulated_inv_ref_id_rccRule:
+"""
+
+def test_merge_rules_adds_new_keys_to_their_rule_type():
+    updated, added, skipped = merge_rules(RULES, QUESTIONS, {"0": "P2", "1": "US,L1,T1,C1,D2,,R5\nGB,,,,,INV2,R6"})
+    assert added == {"non_regulated_rccRule": ["[US|L1|T1|C1|D2]"], "non_regulated_inv_ref_id_rccRule": ["[GB|INV2]"]}
+    assert skipped == []
+    assert updated == """rules:
+  # keyed by [COUNTRY|LOB|TYPE|DOC_CAT|DOC_TYPE]
+  non_regulated_rccRule:
+    "[US|L1|T1|C1|D1]": R1
+    "[US|L1|T1|C1|D2]": R5
+  inv_ref_id_rccRule:
+    "[US|INV1]": R2
+  non_regulated_inv_ref_id_rccRule:
+    "[GB|INV2]": R6
+"""
+
+def test_merge_rules_skips_existing_keys():
+    # an existing key keeps its RCC, conflicts are reported by /verify-qa instead
+    updated, added, skipped = merge_rules(RULES, QUESTIONS, {"0": "P2", "1": "US,L1,T1,C1,D1,,R9"})
+    assert added == {}
+    assert updated == RULES
+
+def test_merge_rules_uses_the_partition_rule_type():
+    updated, added, skipped = merge_rules(RULES, QUESTIONS, {"0": "P5", "1": "US,,,,,INV3,R7\nUS,L1,T1,C1,D3,,R8"})
+    assert added == {"inv_ref_id_rccRule": ["[US|INV3]"]}
+    assert [line["lineNumber"] for line in skipped] == ["2"]
+    assert "D3" not in updated
+
+def test_merge_rules_ignores_federated_partitions():
+    updated, added, skipped = merge_rules(RULES, QUESTIONS, {"0": "P0", "1": "US,L1,T1,C1,D2,,R5"})
+    assert added == {}
+    assert len(skipped) == 1
+    assert updated == RULES
+
+def test_merge_rules_reports_partly_filled_lines():
+    updated, added, skipped = merge_rules(RULES, QUESTIONS, {"0": "P2", "1": "US,L1,,C1,D2,,R5\nUS,L1,T1,C1,D2,,R5"})
+    assert added == {"non_regulated_rccRule": ["[US|L1|T1|C1|D2]"]}
+    assert skipped == [{"rule": "US,L1,,C1,D2,,R5", "lineNumber": "1", "reason": "its populated columns do not match a Non-Regulated rule type"}]
+
+def test_merge_rules_reports_missing_sections():
+    updated, added, skipped = merge_rules("rules:\n  inv_ref_id_rccRule:\n", QUESTIONS, {"0": "P2", "1": "US,L1,T1,C1,D2,,R5"})
+    assert added == {}
+    assert skipped[0]["reason"] == "the rules file has no non_regulated_rccRule section"
+
+# --- BU On Boarding Merge ---
+BU_QUESTIONS = ["Enter Partition ? (P0, P1, P2, P3, P4, P5)", "Enter BUS UNIT", "Enter Sampling Rule Ref", "Enter Sampling Id", "Enter Sampling Data"]
+
+BU_ON_BOARDING = """busUnitOnBoardingCongif:
+  # existing bus unit
+  BU1:
+    contentRepoRef:
+      - P5_OS1
+    dispositionConfig:
+      enableDeleteNotification: true
+      enableCaseNOtification: true
+      notificationRecipts: bu1@test.com
+    SamplingConfig:
+      - ruleRef: RULE1
+        sampling:
+          id: S1
+          values:
+            - a
+"""
+
+def test_merge_bu_on_boarding_creates_a_new_bus_unit():
+    updated, action = merge_bu_on_boarding(BU_ON_BOARDING, BU_QUESTIONS, {"0": "P2", "1": "BU2", "2": "RULE9", "3": "S2", "4": "x, y"})
+    assert action == "created"
+    assert updated == BU_ON_BOARDING + """  BU2:
+    contentRepoRef:
+      - P2_OS1
+    dispositionConfig:
+      enableDeleteNotification: false
+      enableCaseNOtification: false
+      notificationRecipts: abc@test.com
+    SamplingConfig:
+      - ruleRef: AUTO_APPROVE
+        sampling:
+          id: S2
+          values:
+            - x
+            - y
+"""
+
+def test_merge_bu_on_boarding_updates_an_existing_bus_unit():
+    updated, action = merge_bu_on_boarding(BU_ON_BOARDING, BU_QUESTIONS, {"0": "P5", "1": "BU1", "2": "RULE1", "3": "S9", "4": "a\nb"})
+    assert action == "updated"
+    assert updated == BU_ON_BOARDING + "            - b\n"
+
+def test_merge_bu_on_boarding_keeps_the_flags_of_an_existing_bus_unit():
+    updated, action = merge_bu_on_boarding(BU_ON_BOARDING, BU_QUESTIONS, {"0": "P2", "1": "BU1", "2": "", "3": "", "4": "a"})
+    assert action == "updated"
+    assert "enableDeleteNotification: true" in updated and "enableCaseNOtification: true" in updated
+    assert "false" not in updated
+
+def test_merge_bu_on_boarding_adds_a_new_sampling_rule():
+    updated, action = merge_bu_on_boarding(BU_ON_BOARDING, BU_QUESTIONS, {"0": "P5", "1": "BU1", "2": "RULE2", "3": "S3", "4": "c"})
+    assert action == "updated"
+    assert updated == BU_ON_BOARDING + """      - ruleRef: RULE2
+        sampling:
+          id: S3
+          values:
+            - c
+"""
+
+def test_merge_bu_on_boarding_creates_the_section():
+    updated, action = merge_bu_on_boarding("", BU_QUESTIONS, {"0": "P5", "1": "BU3", "2": "", "3": "", "4": "v"})
+    assert action == "created"
+    assert updated.startswith("busUnitOnBoardingCongif:\n  BU3:\n")
+    assert "ruleRef: AUTO_APPROVE" in updated
+
+def test_merge_bu_on_boarding_requires_a_bus_unit():
+    with pytest.raises(ValueError):
+        merge_bu_on_boarding(BU_ON_BOARDING, BU_QUESTIONS, {"0": "P2", "1": " "})
@@ -0,0 +1,101 @@
+import types
+import pytest
+import github_content_cache
+from github_content_cache import GithubContentCache
+
+SHA1 = "1" * 40
+SHA2 = "2" * 40
+
+class FakeRepo:
+    url = "https://api.github.com/repos/org/config"
+
+    def __init__(self, files):
+        self.files = files
+        self.downloads = []
+
+    def get_contents(self, file_path, ref):
+        self.downloads.append((ref, file_path))
+        return types.SimpleNamespace(decoded_content=self.files[file_path].encode())
+
+class FakeCommitsApi:
+    """Answers GET .../commits/<ref> like GitHub: the sha with an ETag, or 304 when If-None-Match still matches"""
+
+    def __init__(self, sha):
+        self.sha = sha
+        self.requests = []
+
+    def get(self, url, headers, timeout):
+        self.requests.append((url, dict(headers)))
+        etag = f'"{self.sha}"'
+        if headers.get("If-None-Match") == etag:
+            return types.SimpleNamespace(status_code=304, text="", headers={})
+        return types.SimpleNamespace(status_code=200, text=self.sha, headers={"ETag": etag}, raise_for_status=lambda: None)
+
+@pytest.fixture
+def commits_api(monkeypatch):
+    api = FakeCommitsApi(SHA1)
+    monkeypatch.setattr(github_content_cache.requests, "get", api.get)
+    return api
+
+# --- resolve_sha ---
+def test_resolve_sha_revalidates_with_the_etag(commits_api):
+    cache = GithubContentCache(FakeRepo({}), "token")
+    assert cache.resolve_sha("ob") == SHA1
+    assert "If-None-Match" not in commits_api.requests[0][1]
+    assert commits_api.requests[0][1]["Authorization"] == "token token"
+
+    # unchanged branch, a 304 answers with the cached sha
+    assert cache.resolve_sha("ob") == SHA1
+    assert commits_api.requests[1][1]["If-None-Match"] == f'"{SHA1}"'
+
+    # the branch moved, the new sha and ETag replace the cached ones
+    commits_api.sha = SHA2
+    assert cache.resolve_sha("ob") == SHA2
+    assert cache.refs["ob"] == (f'"{SHA2}"', SHA2)
+
+def test_resolve_sha_does_not_request_a_sha(commits_api):
+    assert GithubContentCache(FakeRepo({}), None).resolve_sha(SHA2) == SHA2
+    assert commits_api.requests == []
+
+def test_resolve_sha_quotes_the_branch_name(commits_api):
+    GithubContentCache(FakeRepo({}), None).resolve_sha("feature/a#1?x%")
+    assert commits_api.requests[0][0] == f"{FakeRepo.url}/commits/feature/a%231%3Fx%25"
+
+# --- fetch ---
+def test_fetch_downloads_once_per_sha_and_path(commits_api):
+    repo = FakeRepo({"sor.yml": "sor", "rules.yml": "rules"})
+    cache = GithubContentCache(repo, None)
+    assert cache.fetch("ob", "sor.yml") == "sor"
+    assert cache.fetch("ob", "sor.yml") == "sor"
+    assert cache.fetch(SHA1, "sor.yml") == "sor"
+    assert cache.fetch("ob", "rules.yml") == "rules"
+    assert repo.downloads == [(SHA1, "sor.yml"), (SHA1, "rules.yml")]
+    assert cache.stats() == {"entries": 2, "size_bytes": 8, "hits": 2, "misses": 2}
+
+    # a new commit on the branch is a new key
+    commits_api.sha = SHA2
+    cache.fetch("ob", "sor.yml")
+    assert repo.downloads[-1] == (SHA2, "sor.yml")
+
+# --- LRU byte cap ---
+def test_fetch_evicts_least_recently_used_entries_over_max_bytes(commits_api):
+    repo = FakeRepo({"a": "aaaa", "b": "bbbb", "c": "cccc"})
+    cache = GithubContentCache(repo, None, max_bytes=10)
+    cache.fetch(SHA1, "a")
+    cache.fetch(SHA1, "b")
+    # the hit makes a the most recently used entry, so b is evicted for c
+    cache.fetch(SHA1, "a")
+    cache.fetch(SHA1, "c")
+    assert list(cache.entries) == [(SHA1, "a"), (SHA1, "c")]
+    assert cache.size_bytes == 8
+    cache.fetch(SHA1, "b")
+    assert repo.downloads == [(SHA1, "a"), (SHA1, "b"), (SHA1, "c"), (SHA1, "b")]
+
+def test_put_replaces_an_entry_and_skips_content_over_max_bytes():
+    cache = GithubContentCache(FakeRepo({}), None, max_bytes=10)
+    cache.put((SHA1, "a"), "aaaa")
+    cache.put((SHA1, "a"), "aaaaaa")
+    assert cache.size_bytes == 6
+    cache.put((SHA1, "big"), "x" * 11)
+    assert list(cache.entries) == [(SHA1, "a")]
+    assert cache.size_bytes == 6
@@ -0,0 +1,11 @@
+import os
+import subprocess
+import sys
+from conftest import AI_AGENT_DIR
+
+def test_app_imports_within_budget():
+    # a fresh interpreter, so modules already imported by other tests do not hide the cost
+    result = subprocess.run([sys.executable, "-c", "import main"], cwd=AI_AGENT_DIR, capture_output=True, text=True,
+                            env={**os.environ, "IMPORT_TIME_BUDGET_SECONDS": os.getenv("IMPORT_TIME_BUDGET_SECONDS", "1.0")})
+    assert result.returncode == 0, result.stderr
+    assert "Imported the app in" in result.stdout, result.stdout
@@ -0,0 +1,16 @@
+from llm_cache import LLMResponseCache
+
+def test_cache_hits_from_memory_and_disk(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    cache = LLMResponseCache(path)
+    cache.put("k", "answer")
+    assert cache.get("k") == "answer"
+    # a new instance only has the SQLite table
+    assert LLMResponseCache(path).get("k") == "answer"
+
+def test_empty_responses_are_not_cached(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"))
+    cache.put("empty", "")
+    cache.put("blank", " \n")
+    assert cache.get("empty") is None and cache.get("blank") is None
+    assert cache.stats()["memory_entries"] == 0 and cache.stats()["disk_entries"] == 0
@@ -0,0 +1,43 @@
+import pytest
+from questionnaire import QUESTIONS, QUESTION_TEXTS
+
+def question(label):
+    return next(q for q in QUESTIONS if label.lower() in q.text.lower())
+
+def answers_with_partition(partition):
+    return {QUESTION_TEXTS.index(question("Partition").text): partition}
+
+@pytest.mark.parametrize("label", ["On Boarding Name", "Partition", "SOR Codes", "RCC RULES", "Sampling Data"])
+def test_empty_answers_are_rejected(label):
+    assert question(label).validate("  ", {}) == "An answer is required."
+
+def test_partition():
+    assert question("Partition").validate("P3", {}) is None
+    assert question("Partition").validate("p0", {}) is None
+    assert "Invalid partition" in question("Partition").validate("P6", {})
+
+def test_sor_codes():
+    assert question("SOR Codes").validate("ACCT/SOR1, DEAL/SOR-2", {}) is None
+    error = question("SOR Codes").validate("ACCT/SOR1,SOR2", {})
+    assert "'SOR2'" in error and "SOR1" not in error
+
+def test_rcc_rules_match_the_partition_rule_type():
+    rcc_rules = question("RCC RULES")
+    assert rcc_rules.validate("US,L,T,C,D,,R1", answers_with_partition("P2")) is None
+    assert rcc_rules.validate("#COUNTRY,INV_REF,RCC\nUS,INV1,R1", answers_with_partition("P5")) is None
+    assert "do not match a Regulated rule type" in rcc_rules.validate("US,L,T,C,D,,R1", answers_with_partition("P5"))
+
+def test_rcc_rules_without_a_known_partition():
+    rcc_rules = question("RCC RULES")
+    assert rcc_rules.validate("US,,,,,INV1,R1", {}) is None
+    assert "must be filled" in rcc_rules.validate("US,L,,,,,R1", answers_with_partition("P0"))
+
+def test_rcc_rules_require_the_rcc_column():
+    assert "the RCC column is empty" in question("RCC RULES").validate("US,L,T,C,D,,", answers_with_partition("P2"))
+
+def test_sampling_data():
+    assert question("Sampling Data").validate("a,b\nc", {}) is None
+    assert "Invalid Sampling Data" in question("Sampling Data").validate(", ,", {})
+
+def test_only_free_text_questions_need_the_llm():
+    assert [q.text for q in QUESTIONS if q.needs_llm] == ["Enter On Boarding Name", "Enter BUS UNIT"]
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from rcc_rules import FEDERATED, NON_REGULATED, REGULATED, detect_conflicts, parse_rcc_rules, partition_type
+
+QUESTIONS = ["Enter Partition ? (P0, P1, P2, P3, P4, P5)", "Enter RCC RULES"]
+
+RULES = """
+rules:
+  non_regulated_rccRule:
+    "[US|L1|T1|C1|D1]": R1
+  inv_ref_id_rccRule:
+    "[US|INV1]": R2
+  non_regulated_inv_ref_id_rccRule:
+    "[GB|INV2]": R3
+"""
+
+def conflicts_for(partition, rcc_rules, rules=RULES):
+    return detect_conflicts(QUESTIONS, {"0": partition, "1": rcc_rules}, rules)
+
+# --- Parsing ---
+def test_parse_without_header_uses_default_columns():
+    rows = parse_rcc_rules("US,L1,T1,C1,D1,,R1\n\nGB,,,,,INV2,R3")
+    assert [row["lineNumber"] for row in rows] == [1, 3]
+    assert rows[0]["COUNTRY"] == "US" and rows[0]["DOC_TYPE"] == "D1" and rows[0]["RCC"] == "R1"
+    assert rows[1]["INV_REF"] == "INV2" and rows[1]["LOB"] == ""
+    assert rows[0]["rule"] == "US,L1,T1,C1,D1,,R1"
+
+def test_parse_with_header_uses_its_column_order():
+    rows = parse_rcc_rules("#COUNTRY,INV_REF,RCC\nUS,INV1,R9")
+    assert len(rows) == 1
+    assert rows[0]["COUNTRY"] == "US" and rows[0]["INV_REF"] == "INV1" and rows[0]["RCC"] == "R9"
+    assert rows[0]["lineNumber"] == 2
+
+def test_parse_pipe_separated_lines():
+    rows = parse_rcc_rules("US|L1|T1|C1|D1||R1")
+    assert rows[0]["DOC_CAT"] == "C1" and rows[0]["RCC"] == "R1"
+
+def test_partition_type():
+    assert partition_type("P0") == FEDERATED
+    assert partition_type("p3") == NON_REGULATED
+    assert partition_type("P5") == REGULATED
+    assert partition_type("P9") is None
+
+# --- Conflict detection per partition ---
+def test_non_regulated_conflict_on_different_rcc():
+    conflicts = conflicts_for("P2", "US,L1,T1,C1,D1,,R9")
+    assert conflicts == [{
+        "rule": "US,L1,T1,C1,D1,,R9",
+        "lineNumber": "1",
+        "existingRcc": "R1",
+        "inputRcc": "R9",
+        "reasonForConflict": "Key [US|L1|T1|C1|D1] already exists in non_regulated_rccRule with RCC R1"
+    }]
+
+def test_non_regulated_inv_ref_conflict():
+    conflicts = conflicts_for("P1", "GB,,,,,INV2,R9")
+    assert [c["existingRcc"] for c in conflicts] == ["R3"]
+
+def test_same_rcc_or_new_key_is_not_a_conflict():
+    assert conflicts_for("P2", "US,L1,T1,C1,D1,,R1\nUS,L1,T1,C1,D2,,R1") == []
+
+def test_regulated_only_checks_inv_ref_rules():
+    # the non regulated key matches but a Regulated partition only has inv_ref_id_rccRule
+    assert conflicts_for("P5", "US,L1,T1,C1,D1,,R9") == []
+    assert [c["existingRcc"] for c in conflicts_for("P5", "US,,,,,INV1,R9")] == ["R2"]
+
+def test_federated_has_no_conflicts():
+    assert conflicts_for("P0", "US,L1,T1,C1,D1,,R9\nUS,,,,,INV1,R9") == []
+
+def test_no_rules_content_has_no_conflicts():
+    assert conflicts_for("P2", "US,L1,T1,C1,D1,,R9", rules="") == []
+
+# --- /verify-qa ---
+def test_verify_qa_reports_fetch_errors(monkeypatch):
+    import main
+
+    class FailingContentCache:
+        def fetch(self, ref, path):
+            raise RuntimeError("rate limited")
+
+    monkeypatch.setattr(main, "get_content_cache", lambda: FailingContentCache())
+    main.verify_qa_store.put("verify-test", main.VerifyQAInput(questions=QUESTIONS, answers={"0": "P2", "1": "US,L1,T1,C1,D1,,R9"}))
+    try:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(main.verify_qa("verify-test", "main"))
+        assert error.value.status_code == 502
+    finally:
+        main.verify_qa_store.delete("verify-test")
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+from state_store import SQLiteBackend, StateStore
+
+def test_async_accessors_run_the_sqlite_backend_off_the_event_loop(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "state.sqlite3"), "test", 10)
+    store = StateStore("test", backend, ttl_seconds=60)
+    threads = []
+    for name in ["get", "put", "delete"]:
+        method = getattr(backend, name)
+
+        def spy(*args, method=method):
+            threads.append(threading.current_thread())
+            return method(*args)
+
+        setattr(backend, name, spy)
+
+    async def run():
+        await store.aput("a", {"value": 1})
+        assert await store.aget("a") == {"value": 1}
+        await store.adelete("a")
+        assert await store.aget("a") is None
+
+    asyncio.run(run())
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads
@@ -0,0 +1,137 @@
+import asyncio
+import submit_on_boarding_service as service
+
+QUESTIONS = ["Enter Partition ? (P0, P1, P2, P3, P4, P5)", "Enter BUS UNIT", "Enter Sampling Rule Ref", "Enter Sampling Id", "Enter Sampling Data"]
+ANSWERS = {"0": "P2", "1": "BU1", "2": "", "3": "S1", "4": "a"}
+
+def submit_state(**state):
+    return {"questions": QUESTIONS, "answers": ANSWERS, "branch_name": "ob", "jira_no": "J-1", "base_sha": "base", **state}
+
+# --- Branch ---
+def test_unresolved_branch_head_aborts_the_submit(monkeypatch):
+    class FailingContentCache:
+        def resolve_sha(self, ref):
+            raise RuntimeError("rate limited")
+
+    monkeypatch.setattr(service, "create_on_boarding_branch_if_not_exists", lambda state, base_branch: "ob")
+    monkeypatch.setattr(service, "get_content_cache", lambda: FailingContentCache())
+    update = service.create_on_boarding_branch(submit_state(base_branch="main", base_sha=""))
+    assert update["abort"] is True and update["base_sha"] == ""
+
+# --- Merge guards ---
+def test_bu_merge_skipped_when_aborted():
+    state = submit_state(abort=True, bu_on_boarding_content="busUnitOnBoardingCongif:\n")
+    assert service.merge_bu_on_boarding_node(state) == {}
+    assert asyncio.run(service.amerge_bu_on_boarding_node(state)) == {}
+
+def test_bu_merge_skipped_without_fetched_content():
+    # merging into nothing would replace the whole file with the new bus unit only
+    state = submit_state(bu_on_boarding_content="")
+    assert service.merge_bu_on_boarding_node(state) == {}
+    assert asyncio.run(service.amerge_bu_on_boarding_node(state)) == {}
+
+def test_bu_merge_of_fetched_content():
+    update = service.merge_bu_on_boarding_node(submit_state(bu_on_boarding_content="busUnitOnBoardingCongif:\n"))
+    assert "BU1:" in update["updated_bu_on_boarding"]
+
+def test_bu_merge_failure_aborts_the_submit(monkeypatch):
+    monkeypatch.setattr(service, "bu_on_boarding_llm_fallback", False)
+    # no BUS UNIT answer, the deterministic merge raises
+    state = submit_state(answers={**ANSWERS, "1": ""}, bu_on_boarding_content="busUnitOnBoardingCongif:\n")
+    assert service.merge_bu_on_boarding_node(state) == {"abort": True}
+    assert asyncio.run(service.amerge_bu_on_boarding_node(state)) == {"abort": True}
+
+def test_sor_codes_merge_failure_aborts_the_submit():
+    state = submit_state(answers={"0": "ACCT/ACC3"}, questions=["Enter Eligible SOR Codes"], sor_codes_content="sorCodes:\n  Acct:\n    code: ACC1\n")
+    assert service.merge_sor_codes_node(state) == {"abort": True}
+
+def test_sor_codes_without_a_section_are_reported(monkeypatch):
+    messages = []
+    monkeypatch.setattr(service, "stream_message_to_ui", messages.append)
+    state = submit_state(answers={"0": "DEAL/DL9"}, questions=["Enter Eligible SOR Codes"], sor_codes_content="sorCodes:\n  Acct:\n    - ACC1\n")
+    assert service.merge_sor_codes_node(state) == {}
+    assert len(messages) == 1 and "DEAL: DL9" in messages[0] and "already up to date" not in messages[0]
+
+def test_skipped_rules_are_reported(monkeypatch):
+    messages = []
+    monkeypatch.setattr(service, "stream_message_to_ui", messages.append)
+    state = submit_state(questions=["Enter Partition ? (P0, P1, P2, P3, P4, P5)", "Enter RCC RULES"], answers={"0": "P2", "1": "US,L1,,C1,D2,,R5"},
+                         rules_content="rules:\n  non_regulated_rccRule:\n    \"[US|L1|T1|C1|D1]\": R1\n")
+    assert service.merge_rules_node(state) == {}
+    assert len(messages) == 1 and "line 1 'US,L1,,C1,D2,,R5'" in messages[0]
+
+# --- Commit ---
+def test_commit_refused_when_aborted(monkeypatch):
+    commits = []
+    monkeypatch.setattr(service, "commit_files", lambda *args: commits.append(args))
+    assert service.commit_files_node(submit_state(abort=True, pending_files={"bu.yml": "x"})) == {}
+    assert commits == []
+
+def test_commit_failure_aborts_the_submit(monkeypatch):
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(service, "commit_files", fail)
+    state = submit_state(pending_files={"bu.yml": "x"})
+    update = service.commit_files_node(state)
+    assert update == {"abort": True}
+    assert service.route_after_commit({**state, **update}) == "end"
+
+def test_nothing_to_commit_ends_without_a_pr(monkeypatch):
+    commits = []
+    monkeypatch.setattr(service, "commit_files", lambda *args: commits.append(args))
+    state = submit_state(pending_files={})
+    assert service.commit_files_node(state) == {}
+    assert commits == []
+    assert service.route_after_commit(state) == "end"
+
+def test_commit_of_pending_files(monkeypatch):
+    commits = []
+    monkeypatch.setattr(service, "commit_files", lambda *args: commits.append(args))
+    state = submit_state(pending_files={"bu.yml": "x"}, change_notes={"bu.yml": "created bus unit BU1"})
+    assert service.commit_files_node(state) == {}
+    assert commits == [({"bu.yml": "x"}, "ob", "J-1", "base", {"bu.yml": "created bus unit BU1"})]
+    assert service.route_after_commit(state) == "create_pr"
+
+def test_commit_message_describes_the_changes():
+    files = {"sor.yml": "x", "rules.yml": "y"}
+    notes = {"sor.yml": "added SOR codes Acct: ACC3", "bu.yml": "created bus unit BU1"}
+    assert service.commit_message_for(files, "J-1", notes) == "J-1 Update sor.yml, rules.yml\n\n- sor.yml: added SOR codes Acct: ACC3"
+    assert service.commit_message_for(files, "J-1") == "J-1 Update sor.yml, rules.yml"
+
+def test_bu_merge_notes_the_change():
+    update = service.merge_bu_on_boarding_node(submit_state(bu_on_boarding_content="busUnitOnBoardingCongif:\n"))
+    assert list(update["change_notes"].values()) == ["created bus unit BU1"]
+
+# --- LLM cache ---
+class FakeLLMCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, response):
+        self.entries[key] = response
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aput(self, key, response):
+        self.put(key, response)
+
+def test_completions_are_not_cached_without_use_cache(monkeypatch):
+    cache = FakeLLMCache()
+    monkeypatch.setattr(service, "get_llm_cache", lambda: cache)
+    monkeypatch.setattr(service, "model", "OPENAI")
+    monkeypatch.setattr(service, "call_openai", lambda *args: "answer")
+
+    async def acall_openai(*args):
+        return "answer"
+
+    monkeypatch.setattr(service, "acall_openai", acall_openai)
+    assert service.call_ai_model("system", "user", "yaml", use_cache=False) == "answer"
+    assert asyncio.run(service.acall_ai_model("system", "user", "yaml", use_cache=False)) == "answer"
+    assert cache.entries == {}
+    asyncio.run(service.acall_ai_model("system", "user", "yaml"))
+    assert list(cache.entries.values()) == ["answer"]
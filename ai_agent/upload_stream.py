@@ -0,0 +1,40 @@
+from typing import Any, AsyncIterator, BinaryIO, Dict
+from dotenv import load_dotenv
+import asyncio
+import hashlib
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Uploads are read and forwarded in chunks of this size, so memory per in flight request stays at one chunk
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 64 * 1024))
+
+async def read_chunks(file: BinaryIO, chunk_size: int = UPLOAD_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Stream a (spooled) upload from its start, reads run in a worker thread since the file may be on disk"""
+    await asyncio.to_thread(file.seek, 0)
+    while True:
+        chunk = await asyncio.to_thread(file.read, chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+async def describe_upload(upload: Any, **metadata) -> Dict[str, Any]:
+    """Hash and measure an UploadFile without loading it. The returned dict holds the open file under "file"
+    for streaming it to the classification API, everything else is metadata that is safe to keep in state."""
+    sha256 = hashlib.sha256()
+    size = 0
+    async for chunk in read_chunks(upload.file):
+        sha256.update(chunk)
+        size += len(chunk)
+    return {
+        "file": upload.file,
+        "filename": upload.filename,
+        "content_type": upload.content_type,
+        "size": size,
+        "sha256": sha256.hexdigest(),
+        **metadata
+    }
+
+def without_file(file_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in file_info.items() if key != "file"}
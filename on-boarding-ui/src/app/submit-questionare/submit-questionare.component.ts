@@ -1,4 +1,4 @@
-import { CUSTOM_ELEMENTS_SCHEMA, Component, EventEmitter, Input, OnChanges, OnInit, Output, SimpleChanges, inject } from '@angular/core';
+import { CUSTOM_ELEMENTS_SCHEMA, Component, EventEmitter, Input, OnChanges, OnDestroy, OnInit, Output, SimpleChanges, inject } from '@angular/core';
 import { FormBuilder, FormGroup, ReactiveFormsModule, Validators } from '@angular/forms';
 import { MatStepperModule } from '@angular/material/stepper';
 import { MatFormFieldModule } from '@angular/material/form-field';
@@ -9,6 +9,7 @@ import { HttpClient } from '@angular/common/http';
 import { MatSnackBar } from '@angular/material/snack-bar';
 import { EventStreamService } from '../submit-questionares/event-stream.service';
 import { MatDialog } from '@angular/material/dialog';
+import { Subscription } from 'rxjs';
 import { ConfirmDialogComponent } from '../submit-questionares/modal-dialog/modal-dialog.component';
 
 @Component({
@@ -25,7 +26,7 @@ import { ConfirmDialogComponent } from '../submit-questionares/modal-dialog/moda
   templateUrl: './submit-questionare.component.html',
   styleUrls: ['./submit-questionare.component.scss'],
 })
-export class SubmitQuestionareComponent implements OnInit,OnChanges  {
+export class SubmitQuestionareComponent implements OnInit,OnChanges,OnDestroy  {
   private _snackBar = inject(MatSnackBar);
 
   firstFormGroup: FormGroup;
@@ -51,6 +52,8 @@ export class SubmitQuestionareComponent implements OnInit,OnChanges  {
   };
 
   finalJson: any;
+  // events of the running submission only, other workflows are not streamed to this browser
+  private serverEvents?: Subscription;
 
   constructor(private fb: FormBuilder,private http: HttpClient,public eventStreamService: EventStreamService,
     private dialog: MatDialog) {
@@ -101,6 +104,23 @@ export class SubmitQuestionareComponent implements OnInit,OnChanges  {
     
   }
 
+  ngOnDestroy(): void {
+    this.stopServerEvents();
+  }
+
+  startServerEvents(workflowId: string){
+    this.stopServerEvents();
+    this.serverEvents = this.eventStreamService.getServerEvents(workflowId).subscribe({
+      next: (msg:any) => this.eventStreamService.addEvent(msg),
+      error: (err) => console.error('SSE error:', err),
+    });
+  }
+
+  stopServerEvents(){
+    this.serverEvents?.unsubscribe();
+    this.serverEvents = undefined;
+  }
+
   generatePayload() {
     const questions = this.questionare.value.questions;
   
@@ -137,26 +157,51 @@ export class SubmitQuestionareComponent implements OnInit,OnChanges  {
     this.submitAction = true;
     let payload = this.generatePayload();
 
-    this.http.post('http://localhost:8000/questionare', payload).subscribe({
-      next: (response) => {
-        console.log('Success:', response);
-        this.finalJson = response;
-        // this.formSubmit.emit({status:"Success",key:this.questionare.key})
-        setTimeout(()=>{
-          this.eventStreamService.events = [];
-        },7500)
-        this.submitAction = false;
+    // subscribed before the submit so the first events of the run are not missed
+    const workflowId = payload.new_branch || crypto.randomUUID();
+    this.startServerEvents(workflowId);
+
+    // the pipeline runs as a background job, poll it until it finishes
+    this.http.post<any>('http://localhost:8000/questionare', {...payload, workflow_id: workflowId}).subscribe({
+      next: (job) => {
+        console.log('Queued:', job);
+        this.pollJob(job.job_id);
       },
-      error: (error) => {
-        this.submitAction = false;
-        console.error('Error:', error);
-        this.openSnackBar('Failed to submit onboarding.','');
-        this.eventStreamService.events.push('Failed to submit onboarding.');
-      }
+      error: (error) => this.onSubmitFailed(error)
     });
     
   }
 
+  pollJob(jobId: string){
+    this.http.get<any>(`http://localhost:8000/jobs/${jobId}`).subscribe({
+      next: (job) => {
+        if (job.status === 'completed') {
+          console.log('Success:', job);
+          this.finalJson = job;
+          this.stopServerEvents();
+          // this.formSubmit.emit({status:"Success",key:this.questionare.key})
+          setTimeout(()=>{
+            this.eventStreamService.events = [];
+          },7500)
+          this.submitAction = false;
+        } else if (job.status === 'failed' || job.status === 'cancelled') {
+          this.onSubmitFailed(job.error || job.status);
+        } else {
+          setTimeout(() => this.pollJob(jobId), 2000);
+        }
+      },
+      error: (error) => this.onSubmitFailed(error)
+    });
+  }
+
+  onSubmitFailed(error: any){
+    this.submitAction = false;
+    this.stopServerEvents();
+    console.error('Error:', error);
+    this.openSnackBar('Failed to submit onboarding.','');
+    this.eventStreamService.events.push('Failed to submit onboarding.');
+  }
+
   openSnackBar(message: string, action: string) {
     this._snackBar.open(message,action,{
       duration: 5000
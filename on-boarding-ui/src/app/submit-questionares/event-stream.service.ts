@@ -9,21 +9,35 @@ export class EventStreamService {
 
   
   events:any = [];
+
+  // Streamed LLM output arrives as many llm_chunk events, keep them as one growing entry per file
+  addEvent(msg: any) {
+    const last = this.events[this.events.length - 1];
+    if (msg?.type === 'llm_chunk' && last?.type === 'llm_chunk' && last.extraText === msg.extraText) {
+      last.message += msg.message;
+    } else {
+      this.events.push(msg);
+    }
+  }
   
-  getServerEvents(): Observable<any> {
+  // Without a workflowId the stream carries the events of every workflow
+  getServerEvents(workflowId?: string): Observable<any> {
     return new Observable<any>((observer) => {
-      const eventSource = new EventSource('http://localhost:8000/events'); // Adjust if needed
+      const url = 'http://localhost:8000/events' + (workflowId ? '?workflow_id=' + encodeURIComponent(workflowId) : '');
+      const eventSource = new EventSource(url); // Adjust if needed
 
       eventSource.onmessage = (event) => {
         this.ngZone.run(() => {
-          observer.next(JSON.parse(event.data.replace(/'/g, '"')));
+          observer.next(JSON.parse(event.data));
         });
       };
 
+      // The browser reconnects on its own and sends Last-Event-ID, so only missed events are replayed
       eventSource.onerror = (error) => {
         console.error('EventSource error:', error);
-        observer.error(error);
-        eventSource.close();
+        if (eventSource.readyState === EventSource.CLOSED) {
+          observer.error(error);
+        }
       };
 
       return () => eventSource.close();
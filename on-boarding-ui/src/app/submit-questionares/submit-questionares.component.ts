@@ -45,11 +45,7 @@ export class SubmitQuestionaresComponent implements OnInit {
   constructor(private http: HttpClient,public eventStreamService: EventStreamService) {}
 
   ngOnInit(): void {
-    this.eventStreamService.getServerEvents().subscribe({
-      next: (msg:any) => this.eventStreamService.events.push(msg),
-      error: (err) => console.error('SSE error:', err),
-    });
-
+    // each submission subscribes to the events of its own workflow (see SubmitQuestionareComponent)
     this.loadQuestionaresToSubmit();
   }
 